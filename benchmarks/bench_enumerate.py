@@ -0,0 +1,129 @@
+from __future__ import annotations
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+# enumerate_snapshot (os.scandir, explicit stack) against the os.walk walk
+# it replaced: wall time and the file system calls each one makes.
+#
+#   python benchmarks/bench_enumerate.py /usr/lib/python3.11 --repeat 5
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from contextpacker.core.model import Node, Snapshot  # noqa: E402
+from contextpacker.core.pipeline_enumerate import enumerate_snapshot  # noqa: E402
+
+# Calls that reach the file system (DirEntry.is_dir/is_symlink only do so
+# when d_type is unknown, so they are counted separately)
+_FS_CALLS = {
+    "stat": "stat",
+    "lstat": "stat",
+    "DirEntry.stat": "stat",
+    "scandir": "scandir",
+    "DirEntry.is_dir": "d_type",
+    "DirEntry.is_symlink": "d_type",
+}
+
+
+def walk_snapshot(project_root: Path) -> Snapshot:
+    # The os.walk implementation enumerate_snapshot replaced
+    root = Path(project_root).expanduser().resolve()
+    nodes: dict[Path, Node] = {}
+    children: dict[Path, list[Path]] = {}
+    st = root.stat()
+    nodes[root] = Node(root, Path("."), True, st.st_size, st.st_mtime_ns)
+    children[root] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        d = Path(dirpath)
+        dirnames.sort()
+        filenames.sort()
+        if d not in nodes:
+            st = d.stat()
+            nodes[d] = Node(d, d.relative_to(root), True, st.st_size, st.st_mtime_ns)
+        children.setdefault(d, [])
+        for name in dirnames:
+            p = d / name
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            nodes[p] = Node(p, p.relative_to(root), True, st.st_size, st.st_mtime_ns)
+            children.setdefault(p, [])
+            children[d].append(p)
+        for name in filenames:
+            p = d / name
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            nodes[p] = Node(p, p.relative_to(root), False, st.st_size, st.st_mtime_ns)
+            children[d].append(p)
+    for k, v in children.items():
+        children[k] = sorted(v, key=lambda x: str(x))
+    return Snapshot(root=root, nodes=nodes, children=children)
+
+
+def count_calls(fn: Callable[[], Snapshot]) -> Counter[str]:
+    calls: Counter[str] = Counter()
+
+    def profile(frame, event, arg):  # type: ignore[no-untyped-def]
+        if event == "c_call":
+            kind = _FS_CALLS.get(getattr(arg, "__qualname__", ""))
+            if kind is not None:
+                calls[kind] += 1
+
+    # threading.setprofile covers the scan pool's threads (--workers)
+    sys.setprofile(profile)
+    threading.setprofile(profile)
+    try:
+        fn()
+    finally:
+        threading.setprofile(None)  # type: ignore[arg-type]
+        sys.setprofile(None)
+    return calls
+
+
+def best_of(fn: Callable[[], Snapshot], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="enumerate_snapshot against os.walk"
+    )
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    old = walk_snapshot(args.root)
+    new = enumerate_snapshot(args.root, workers=args.workers)
+    if old.nodes != new.nodes or old.children != new.children:
+        print("snapshots differ", file=sys.stderr)
+        return 1
+    print(f"{args.root}: {len(new.nodes):,} entries")
+
+    runs = {
+        "os.walk": lambda: walk_snapshot(args.root),
+        "scandir": lambda: enumerate_snapshot(args.root, workers=args.workers),
+    }
+    for label, fn in runs.items():
+        calls = count_calls(fn)
+        seconds = best_of(fn, args.repeat)
+        counts = ", ".join(f"{k} {calls[k]:,}" for k in ("scandir", "stat", "d_type"))
+        print(f"{label:8} {seconds:7.3f}s  {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,17 @@
 from __future__ import annotations
-import tkinter as tk
-from .app.tk_app import TkApp
+import sys
 
 
 def main() -> None:
+    # Any arguments select the headless CLI; none starts the GUI
+    if len(sys.argv) > 1:
+        from .cli import main as cli_main
+
+        sys.exit(cli_main(sys.argv[1:]))
+
+    import tkinter as tk
+    from .app.tk_app import TkApp
+
     root = tk.Tk()
 
     # Fixes scaling issues on Windows 11
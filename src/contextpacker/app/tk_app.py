@@ -8,6 +8,7 @@ import queue
 from ..core.config import Config
 from ..core.runner import run, run_preview
 from ..core.cancel import CancelToken, CancelledError
+from ..core.session import RunSession
 from ..policy.presets import PRESETS
 from ..policy.ignore_spec import compile_ignore
 from ..io.clipboard import set_clipboard_with_root
@@ -39,6 +40,9 @@ class TkApp:
         self._thread: threading.Thread | None = None
         self._queue: queue.Queue = queue.Queue()
 
+        # Last preview/generate result, reused while still valid
+        self._session = RunSession()
+
         # Background Grid Canvas
         self.bg = GridBackground(root, bg=PALETTE["bg"], grid=PALETTE["grid"], step=26)
         self.bg.pack(fill="both", expand=True)
@@ -236,6 +240,7 @@ class TkApp:
         if not path:
             return
         self.project_path = Path(path).resolve()
+        self._session.clear()
         self.lbl_project.configure(text=f"Project: {self.project_path.name}")
         self.btn_generate.configure(state="normal")
         self.btn_preview.configure(state="normal")
@@ -339,7 +344,7 @@ class TkApp:
 
     def _run_preview_thread(self, cfg, token):
         try:
-            res = run_preview(cfg, token)
+            res = run_preview(cfg, token, self._session)
             self._queue.put(("preview_done", res))
         except CancelledError:
             self._queue.put(("cancelled", None))
@@ -348,7 +353,7 @@ class TkApp:
 
     def _run_generate_thread(self, cfg, token):
         try:
-            res = run(cfg, token)
+            res = run(cfg, token, self._session)
             self._queue.put(("generate_done", res))
         except CancelledError:
             self._queue.put(("cancelled", None))
@@ -393,7 +398,8 @@ class TkApp:
                 text="Generation Complete", foreground=PALETTE["accent"]
             )
             messagebox.showinfo(
-                "Success", f"Generated {len(data.transcript_text)} chars context."
+                "Success",
+                f"Generated {data.transcript_bytes / 1024:.1f} KB context.",
             )
 
     #  Result Panels
@@ -430,13 +436,26 @@ class TkApp:
                 ).pack(anchor="w", padx=10)
 
         # Truncation Warning
-        if data.truncated:
+        if data.dropped_files:
+            ttk.Label(
+                f,
+                text=f"{len(data.dropped_files)} files over the token budget left out",
+                style="TLabel",
+                foreground="#FF5555",
+            ).pack(anchor="w", pady=(5, 0))
+        elif data.truncated:
             ttk.Label(
                 f,
                 text="Selection Truncated (Max Total Bytes Reached)",
                 style="TLabel",
                 foreground="#FF5555",
             ).pack(anchor="w", pady=(5, 0))
+        if data.generated_files:
+            ttk.Label(
+                f,
+                text=f"{data.generated_files} generated files summarized or left out",
+                style="Muted.TLabel",
+            ).pack(anchor="w", pady=(5, 0))
 
         # Snippet Hint
         if data.transcript_preview_text:
@@ -482,6 +501,5 @@ class TkApp:
         )
         btn_cp.pack(side="left", padx=5)
 
-        ttk.Label(f, text=f"Written to: {path.name}", style="Muted.TLabel").pack(
-            anchor="w"
-        )
+        written = f"Written to: {path.parents[1].name} (generation {data.generation})"
+        ttk.Label(f, text=written, style="Muted.TLabel").pack(anchor="w")
@@ -0,0 +1,386 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from .core.config import Config, OutputSpec
+from .core.errors import ContextPackerError
+from .core.model import PreviewArtifacts
+from .core.pipeline_emit import Artifacts
+from .core.runner import run, run_preview
+from .core.watch import watch
+from .policy.ignore_spec import compile_ignore
+from .policy.presets import PRESETS
+from . import __version__
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="contextpacker",
+        description="Pack a project into a transcript, a changes diff and a manifest.",
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="pack one project")
+    p_run.add_argument("--input", "-i", type=Path, default=Path("."))
+    p_run.add_argument(
+        "--preview", action="store_true", help="dry run: report, write nothing"
+    )
+    _add_config_flags(p_run)
+
+    p_batch = sub.add_parser("batch", help="pack many projects in parallel")
+    p_batch.add_argument("roots", nargs="+", type=Path)
+    p_batch.add_argument(
+        "--jobs", "-j", type=int, default=os.cpu_count() or 1, help="processes"
+    )
+    p_batch.add_argument("--preview", action="store_true")
+    _add_config_flags(p_batch)
+
+    p_watch = sub.add_parser("watch", help="keep one project's outputs up to date")
+    p_watch.add_argument("--input", "-i", type=Path, default=Path("."))
+    p_watch.add_argument("--interval", type=float, default=1.0, help="seconds")
+    p_watch.add_argument("--debounce", type=float, default=0.5, help="seconds")
+    _add_config_flags(p_watch)
+    return parser
+
+
+def _add_config_flags(p: argparse.ArgumentParser) -> None:
+    d = Config(project_root=Path("."))
+    p.add_argument(
+        "--select",
+        "-s",
+        action="append",
+        default=[],
+        metavar="NAME[,NAME...]",
+        help="top-level entries to include (default: all not ignored)",
+    )
+    p.add_argument(
+        "--preset", "--profile", choices=sorted(PRESETS), default=d.preset
+    )
+    p.add_argument(
+        "--no-root-files",
+        dest="include_root_text_files",
+        action="store_false",
+        help="leave out text files at the project root",
+    )
+    p.add_argument("--max-file-bytes", type=int, default=d.max_file_bytes)
+    p.add_argument("--max-total-bytes", type=int, default=d.max_total_bytes)
+    p.add_argument("--enumerate-workers", type=int, default=d.enumerate_workers)
+    p.add_argument("--read-workers", type=int, default=d.read_workers)
+    p.add_argument("--compact-snapshot", action="store_true")
+    p.add_argument(
+        "--no-snapshot-cache", dest="snapshot_cache", action="store_false"
+    )
+    p.add_argument(
+        "--no-incremental", dest="incremental_build", action="store_false"
+    )
+    p.add_argument(
+        "--token-budget",
+        type=int,
+        default=d.token_budget,
+        metavar="TOKENS",
+        help="pack the files that fit in this many tokens (replaces the byte total)",
+    )
+    p.add_argument(
+        "--budget-strategy", choices=["greedy", "knapsack"], default=d.budget_strategy
+    )
+    p.add_argument(
+        "--tokenizer",
+        default=d.tokenizer,
+        help='"approx" (default) or "tiktoken:<encoding>"',
+    )
+    p.add_argument(
+        "--priority",
+        action="append",
+        default=[],
+        type=_priority,
+        metavar="GLOB=WEIGHT",
+        help="weight of matching files under a token budget (0 = leave out)",
+    )
+    p.add_argument("--strip-comments", action="store_true")
+    p.add_argument("--collapse-blank-lines", action="store_true")
+    p.add_argument("--minify-json", action="store_true")
+    p.add_argument(
+        "--elide-bodies",
+        action="store_true",
+        help="replace function bodies with '...' (Python and C-like languages)",
+    )
+    p.add_argument(
+        "--compress",
+        action="store_true",
+        help="same as --strip-comments --collapse-blank-lines --minify-json",
+    )
+    p.add_argument(
+        "--dedup",
+        choices=["off", "exact", "near"],
+        default=d.dedup,
+        help="pack repeated files once; later copies reference the first",
+    )
+    p.add_argument(
+        "--near-dup-similarity",
+        type=float,
+        default=d.near_dup_similarity,
+        metavar="0..1",
+    )
+    p.add_argument(
+        "--generated",
+        dest="generated_files",
+        choices=["keep", "exclude", "summarize"],
+        default=d.generated_files,
+        help="lockfiles, minified bundles, files marked generated",
+    )
+    p.add_argument(
+        "--tree-depth",
+        dest="tree_max_depth",
+        type=int,
+        default=d.tree_max_depth,
+        metavar="N",
+        help="collapse directories below depth N in the tree",
+    )
+    p.add_argument(
+        "--tree-width",
+        dest="tree_max_entries",
+        type=int,
+        default=d.tree_max_entries,
+        metavar="N",
+        help="show at most N entries per directory in the tree",
+    )
+    p.add_argument(
+        "--durability",
+        choices=["none", "file", "full"],
+        default=d.durability,
+        help="fsync outputs: file contents, or contents and renames",
+    )
+    p.add_argument("--out-dir", default=d.outputs.out_dir_name, metavar="NAME")
+    p.add_argument("--json", action="store_true", help="print JSON stats")
+
+
+def _priority(text: str) -> tuple[str, float]:
+    pattern, sep, weight = text.rpartition("=")
+    try:
+        if not sep or not pattern:
+            raise ValueError(text)
+        return pattern, float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected GLOB=WEIGHT, got {text!r}")
+
+
+def config_from_args(args: argparse.Namespace, root: Path) -> Config:
+    root = Path(root).expanduser().resolve()
+    if not root.is_dir():
+        raise ContextPackerError(f"Not a directory: {root}")
+    selected = [n for s in args.select for n in s.split(",") if n]
+    if not selected:
+        selected = _default_selection(root, args.preset, args.out_dir)
+    return Config(
+        project_root=root,
+        selected_top_level=tuple(selected),
+        preset=args.preset,
+        include_root_text_files=args.include_root_text_files,
+        max_file_bytes=args.max_file_bytes,
+        max_total_bytes=args.max_total_bytes,
+        enumerate_workers=args.enumerate_workers,
+        compact_snapshot=args.compact_snapshot,
+        snapshot_cache=args.snapshot_cache,
+        read_workers=args.read_workers,
+        incremental_build=args.incremental_build,
+        token_budget=args.token_budget,
+        budget_strategy=args.budget_strategy,
+        tokenizer=args.tokenizer,
+        priorities=tuple(args.priority),
+        strip_comments=args.strip_comments or args.compress,
+        collapse_blank_lines=args.collapse_blank_lines or args.compress,
+        minify_json=args.minify_json or args.compress,
+        elide_bodies=args.elide_bodies,
+        dedup=args.dedup,
+        near_dup_similarity=args.near_dup_similarity,
+        generated_files=args.generated_files,
+        tree_max_depth=args.tree_max_depth,
+        tree_max_entries=args.tree_max_entries,
+        durability=args.durability,
+        outputs=OutputSpec(out_dir_name=args.out_dir),
+    )
+
+
+def _default_selection(root: Path, preset: str, out_dir_name: str) -> list[str]:
+    # Same as "select all" in the GUI: every top-level entry not ignored
+    ignore = compile_ignore(root, preset)
+    with os.scandir(root) as it:
+        return sorted(
+            e.name
+            for e in it
+            if e.name != out_dir_name
+            and not ignore.is_ignored_rel(e.name, e.is_dir(follow_symlinks=False))
+        )
+
+
+# Jobs (module level so batch workers can unpickle them)
+
+
+def pack(cfg: Config, preview: bool = False) -> dict[str, Any]:
+    t0 = time.perf_counter()
+    if preview:
+        stats = _preview_stats(cfg, run_preview(cfg))
+    else:
+        stats = _run_stats(cfg, run(cfg))
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+def _pack_safe(cfg: Config, preview: bool) -> dict[str, Any]:
+    try:
+        return pack(cfg, preview)
+    except Exception as e:
+        return _error_stats(cfg.project_root, e)
+
+
+def _run_stats(cfg: Config, a: Artifacts) -> dict[str, Any]:
+    return {
+        "project": cfg.project_root.name,
+        "root": str(cfg.project_root),
+        "mode": "run",
+        "files": a.files_included,
+        "deduplicated": a.deduplicated,
+        "transcript_bytes": a.transcript_bytes,
+        "changed": bool(a.diff_text),
+        "diff_bytes": len(a.diff_text),
+        "transcript": str(a.transcript_path),
+        "generation": a.generation,
+    }
+
+
+def _preview_stats(cfg: Config, p: PreviewArtifacts) -> dict[str, Any]:
+    root = cfg.project_root
+    return {
+        "project": root.name,
+        "root": str(root),
+        "mode": "preview",
+        "files": p.file_count,
+        "total_bytes": p.total_bytes,
+        "truncated": p.truncated,
+        "tokens": p.total_tokens,
+        "dropped": [f.relative_to(root).as_posix() for f in p.dropped_files],
+        "generated": p.generated_files,
+        "largest": [[f.relative_to(root).as_posix(), n] for f, n in p.largest_files],
+    }
+
+
+def _error_stats(root: Path, e: Exception) -> dict[str, Any]:
+    return {
+        "project": Path(root).name,
+        "root": str(root),
+        "error": f"{type(e).__name__}: {e}",
+    }
+
+
+def _report(stats: dict[str, Any], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(stats, sort_keys=True), flush=True)
+        return
+    name = stats["project"]
+    if "error" in stats:
+        print(f"{name}: error: {stats['error']}", file=sys.stderr, flush=True)
+    elif stats["mode"] == "preview":
+        note = " (truncated by max_total_bytes)" if stats["truncated"] else ""
+        if stats["tokens"] is not None:
+            note = f", ~{stats['tokens']} tokens"
+            note += f" ({len(stats['dropped'])} dropped by budget)"
+        if stats["generated"]:
+            note += f", {stats['generated']} generated"
+        print(
+            f"{name}: {stats['files']} files, "
+            f"{stats['total_bytes'] / 1024:.1f} KB would be packed{note}",
+            flush=True,
+        )
+    else:
+        change = "changed" if stats["changed"] else "unchanged"
+        took = f" ({stats['seconds']:.2f}s)" if "seconds" in stats else ""
+        print(
+            f"{name}: {stats['files']} files, "
+            f"{stats['transcript_bytes'] / 1024:.1f} KB, {change} "
+            f"-> {stats['transcript']}{took}",
+            flush=True,
+        )
+
+
+# Commands
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    stats = _pack_safe(config_from_args(args, args.input), args.preview)
+    _report(stats, args.json)
+    return 1 if "error" in stats else 0
+
+
+def _cmd_batch(args: argparse.Namespace) -> int:
+    # One process per project: the pipeline holds the GIL for most of a
+    # run, so projects only scale across processes. Results are printed as
+    # they finish, one line (or JSON object) per project.
+    configs = []
+    failed = 0
+    for root in args.roots:
+        try:
+            configs.append(config_from_args(args, root))
+        except ContextPackerError as e:
+            _report(_error_stats(root, e), args.json)
+            failed += 1
+
+    jobs = max(1, min(args.jobs, len(configs)))
+    if jobs == 1:
+        for stats in (_pack_safe(c, args.preview) for c in configs):
+            _report(stats, args.json)
+            failed += "error" in stats
+        return 1 if failed else 0
+
+    # Only batch needs multiprocessing; run/watch start without it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_pack_safe, c, args.preview) for c in configs]
+        for fut in as_completed(futures):
+            stats = fut.result()
+            _report(stats, args.json)
+            failed += "error" in stats
+    return 1 if failed else 0
+
+
+def _cmd_watch(args: argparse.Namespace) -> int:
+    cfg = config_from_args(args, args.input)
+    try:
+        watch(
+            cfg,
+            on_update=lambda a: _report(_run_stats(cfg, a), args.json),
+            on_error=lambda e: _report(_error_stats(cfg.project_root, e), args.json),
+            interval=args.interval,
+            debounce=args.debounce,
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "batch":
+            return _cmd_batch(args)
+        if args.command == "watch":
+            return _cmd_watch(args)
+        return _cmd_run(args)
+    except ContextPackerError as e:
+        # --json output stays parsable: the error is one more stats object
+        if args.json:
+            root = getattr(args, "input", Path("."))
+            _report(_error_stats(Path(root).expanduser().resolve(), e), True)
+        else:
+            print(f"contextpacker: error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterator, Mapping, Union
+
+from .model import Node, Snapshot
+
+# Columnar snapshot: one int id per node, parallel arrays per attribute.
+# Ids are assigned breadth-first, so the children of a directory are the
+# contiguous id range [child_start[i], child_start[i] + child_count[i]),
+# already sorted by name. Path objects are only built on demand.
+
+ROOT_ID = 0
+
+
+class CompactSnapshot:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.names: list[str] = []  # interned name table
+        self.name_id = array("i")
+        self.parent = array("i")
+        self.is_dir = array("b")
+        self.size_bytes = array("q")
+        self.mtime_ns = array("q")
+        self.child_start = array("i")
+        self.child_count = array("i")
+        # path -> id for Paths handed out by the views; consumers look the
+        # same (visible) paths up again, so this stays proportional to them
+        self._ids: dict[Path, int] = {}
+        self.nodes: Mapping[Path, Node] = _NodesView(self)
+        self.children: Mapping[Path, list[Path]] = _ChildrenView(self)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    # Building
+
+    def add(
+        self, parent: int, name_id: int, is_dir: bool, size_bytes: int, mtime_ns: int
+    ) -> int:
+        i = len(self.parent)
+        self.parent.append(parent)
+        self.name_id.append(name_id)
+        self.is_dir.append(1 if is_dir else 0)
+        self.size_bytes.append(size_bytes)
+        self.mtime_ns.append(mtime_ns)
+        self.child_start.append(0)
+        self.child_count.append(0)
+        return i
+
+    # Id-level access
+
+    def name(self, i: int) -> str:
+        return self.names[self.name_id[i]] if i != ROOT_ID else ""
+
+    def child_ids(self, i: int) -> range:
+        start = self.child_start[i]
+        return range(start, start + self.child_count[i])
+
+    def rel_parts(self, i: int) -> list[str]:
+        parts: list[str] = []
+        while i != ROOT_ID:
+            parts.append(self.names[self.name_id[i]])
+            i = self.parent[i]
+        parts.reverse()
+        return parts
+
+    def path_of(self, i: int) -> Path:
+        return self.root.joinpath(*self.rel_parts(i))
+
+    def rel_path_of(self, i: int) -> Path:
+        return Path("/".join(self.rel_parts(i))) if i != ROOT_ID else Path(".")
+
+    def node(self, i: int, path: Path | None = None) -> Node:
+        return Node(
+            path if path is not None else self.path_of(i),
+            self.rel_path_of(i),
+            bool(self.is_dir[i]),
+            self.size_bytes[i],
+            self.mtime_ns[i],
+        )
+
+    def id_of(self, path: Path) -> int | None:
+        hit = self._ids.get(path)
+        if hit is not None:
+            return hit
+        p = path if isinstance(path, Path) else Path(path)
+        n = len(self.root.parts)
+        if p.parts[:n] != self.root.parts:
+            return None
+        i = ROOT_ID
+        names, name_id = self.names, self.name_id
+        for part in p.parts[n:]:
+            kids = self.child_ids(i)
+            j = bisect_left(kids, part, key=lambda k: names[name_id[k]])
+            if j == len(kids) or names[name_id[kids[j]]] != part:
+                return None
+            i = kids[j]
+        return i
+
+    def iter_ids(self) -> range:
+        return range(len(self.parent))
+
+
+class _NodesView(Mapping[Path, Node]):
+    # absolute path -> Node, materialized per lookup
+    def __init__(self, snap: CompactSnapshot) -> None:
+        self._snap = snap
+
+    def __getitem__(self, path: Path) -> Node:
+        i = self._snap.id_of(path)
+        if i is None:
+            raise KeyError(path)
+        return self._snap.node(i, path)
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, Path) and self._snap.id_of(path) is not None
+
+    def __iter__(self) -> Iterator[Path]:
+        return (self._snap.path_of(i) for i in self._snap.iter_ids())
+
+    def __len__(self) -> int:
+        return len(self._snap)
+
+
+class _ChildrenView(Mapping[Path, list[Path]]):
+    # absolute dir path -> sorted child paths, materialized per lookup
+    def __init__(self, snap: CompactSnapshot) -> None:
+        self._snap = snap
+
+    def __getitem__(self, path: Path) -> list[Path]:
+        s = self._snap
+        i = s.id_of(path)
+        if i is None or not s.is_dir[i]:
+            raise KeyError(path)
+        out: list[Path] = []
+        for k in s.child_ids(i):
+            c = path / s.names[s.name_id[k]]
+            s._ids[c] = k
+            out.append(c)
+        return out
+
+    def __contains__(self, path: object) -> bool:
+        if not isinstance(path, Path):
+            return False
+        i = self._snap.id_of(path)
+        return i is not None and bool(self._snap.is_dir[i])
+
+    def __iter__(self) -> Iterator[Path]:
+        s = self._snap
+        return (s.path_of(i) for i in s.iter_ids() if s.is_dir[i])
+
+    def __len__(self) -> int:
+        return sum(self._snap.is_dir)
+
+
+# Either representation; consumers only use .root, .nodes and .children
+AnySnapshot = Union[Snapshot, CompactSnapshot]
@@ -4,6 +4,10 @@ from pathlib import Path
 from typing import Literal
 
 DiffMode = Literal["unified"]
+BudgetStrategy = Literal["greedy", "knapsack"]
+DedupMode = Literal["off", "exact", "near"]
+Durability = Literal["none", "file", "full"]
+GeneratedMode = Literal["keep", "exclude", "summarize"]
 
 
 @dataclass(frozen=True)
@@ -11,6 +15,13 @@ class OutputSpec:
     out_dir_name: str = "contextpacker_out"
     transcript_name: str = "transcript.txt"
     changes_name: str = "changes.diff"
+    snapshot_cache_name: str = ".snapshot_cache.json"
+    manifest_name: str = "manifest.json"
+    section_index_name: str = ".transcript_index.json"
+    # Each run's artifacts go to generations/<id>/; CURRENT names the
+    # latest complete one
+    generations_dir_name: str = "generations"
+    pointer_name: str = "CURRENT"
 
 
 @dataclass(frozen=True)
@@ -24,6 +35,43 @@ class Config:
     max_file_bytes: int = 512_000  # 512 KB per file (tune later)
     max_total_bytes: int = 8_000_000  # optional (not enforced yet)
     diff_mode: DiffMode = "unified"
+    # fsync outputs: "file" = contents before each rename, "full" = also the
+    # renames (directory), "none" = leave it to the OS (fastest)
+    durability: Durability = "file"
+
+    # Performance
+    enumerate_workers: int = 4  # threads scanning directories; 1 = serial
+    compact_snapshot: bool = False  # columnar CompactSnapshot (lower memory)
+    snapshot_cache: bool = True  # reuse listings of unchanged directories
+    read_workers: int = 4  # threads reading files ahead; 1 = serial
+    incremental_build: bool = True  # copy unchanged sections from last run
+
+    # Token budget over the transcript (header and tree included); when set
+    # it replaces max_total_bytes
+    token_budget: int | None = None
+    budget_strategy: BudgetStrategy = "greedy"
+    tokenizer: str = "approx"  # "approx", "tiktoken:<encoding>" or registered
+    priorities: tuple[tuple[str, float], ...] = ()  # (rel glob, weight); 0 = skip
+
+    # Compression (render/compress.py), applied to each file's content
+    strip_comments: bool = False  # comments and license headers
+    collapse_blank_lines: bool = False
+    minify_json: bool = False  # whitespace outside strings; JSON lockfiles too
+    elide_bodies: bool = False  # function bodies -> "..." (signatures kept)
+
+    # Deduplication (render/dedup.py): later copies reference the first one
+    dedup: DedupMode = "off"  # "near" also finds exact copies
+    near_dup_similarity: float = 0.8  # estimated Jaccard of distinct lines
+    dedup_min_bytes: int = 512
+
+    # Generated / minified files (policy/generated.py): lockfiles, bundles,
+    # source maps, files marked "do not edit"
+    generated_files: GeneratedMode = "keep"  # "summarize": one-line stand-in
+
+    # Directory tree: deeper directories / further entries per directory
+    # collapse into a "… N more files" line; None = no limit
+    tree_max_depth: int | None = None
+    tree_max_entries: int | None = None
 
     # Preview / UI
     preview_max_files: int = 200
@@ -44,6 +92,26 @@ class Config:
             max_file_bytes=self.max_file_bytes,
             max_total_bytes=self.max_total_bytes,
             diff_mode=self.diff_mode,
+            durability=self.durability,
+            enumerate_workers=self.enumerate_workers,
+            compact_snapshot=self.compact_snapshot,
+            snapshot_cache=self.snapshot_cache,
+            read_workers=self.read_workers,
+            incremental_build=self.incremental_build,
+            token_budget=self.token_budget,
+            budget_strategy=self.budget_strategy,
+            tokenizer=self.tokenizer,
+            priorities=tuple(self.priorities),
+            strip_comments=self.strip_comments,
+            collapse_blank_lines=self.collapse_blank_lines,
+            minify_json=self.minify_json,
+            elide_bodies=self.elide_bodies,
+            dedup=self.dedup,
+            near_dup_similarity=self.near_dup_similarity,
+            dedup_min_bytes=self.dedup_min_bytes,
+            generated_files=self.generated_files,
+            tree_max_depth=self.tree_max_depth,
+            tree_max_entries=self.tree_max_entries,
             preview_max_files=self.preview_max_files,
             preview_max_chars=self.preview_max_chars,
             app_title=self.app_title,
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List
 
@@ -27,13 +27,25 @@ class FilteredSnapshot:
     tree_roots: list[Path]  # absolute top nodes to render under "Project:"
     files_to_read: list[Path]  # absolute file paths, stable sorted
     truncated_by_total: bool = False  # True if max_total_bytes caused truncation
+    dropped_by_budget: list[Path] = field(default_factory=list)  # token budget
+    total_tokens: int | None = None  # header + files_to_read, if counted
+    generated: dict[Path, str] = field(default_factory=dict)  # summarized: reason
+    dropped_as_generated: list[Path] = field(default_factory=list)
+    # Visible children of each visible directory, in tree order (tree_render)
+    visible_children: dict[Path, list[Path]] = field(default_factory=dict)
 
 
 @dataclass(frozen=True)
 class BuiltArtifacts:
-    transcript_text: str
+    transcript_path: Path  # staged temp file, moved into place by write_built
+    transcript_bytes: int
     diff_text: str
     files_to_write: list[Path]  # Files that were *actually* included
+    header_length: int = 0  # bytes before the first "File:" section
+    header_lines: int = 0
+    sections: list = field(default_factory=list)  # SectionEntry per file
+    deduplicated: int = 0  # sections referencing another file's content
+    transcript_blake2b: str = ""  # hash of the staged transcript bytes
 
 
 @dataclass(frozen=True)
@@ -48,3 +60,6 @@ class PreviewArtifacts:
     manifest_dict: dict
     transcript_preview_text: str = ""
     truncated: bool = False
+    dropped_files: list[Path] = field(default_factory=list)  # by token budget
+    total_tokens: int | None = None
+    generated_files: int = 0  # summarized or excluded as generated
@@ -1,46 +1,319 @@
 from __future__ import annotations
+import hashlib
+import os
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, NamedTuple, Union
 
 from .config import Config
-from .model import Snapshot, FilteredSnapshot, BuiltArtifacts
+from .model import FilteredSnapshot, BuiltArtifacts
+from .compact_model import AnySnapshot
 from ..io.out_paths import get_output_paths
-from ..render.tree_render import render_tree
-from ..render.transcript_render import render_transcript
-from ..render.diff_render import unified_diff_text
+from ..render.tree_render import iter_tree
+from ..render.transcript_render import iter_header, render_section, section_parts
+from ..render.compress import compression_key
+from ..render.dedup import Deduper, DupRef, Sketch, dedup_key, render_duplicate, sketch
+from ..render.diff_render import SectionRef, unified_diff_files, unified_diff_sections
+from ..policy.generated import generated_key, packed_text
+from ..io.file_read import (
+    STREAM_THRESHOLD,
+    StreamedText,
+    decode_text,
+    line_breaks,
+    stream_text,
+    read_ahead,
+    read_text_safe,
+)
+from ..io.write_atomic import stage_chunks, discard_staged, encode_text, hashed_chunks
+from ..io.section_index import SectionEntry, SectionIndex, load_section_index
 from .cancel import CancelToken, check_cancel
+from ..io.file_store import FileStore, content_digest
+
+
+def section_render_key(config: Config) -> str:
+    # Everything besides a file's content that shapes its section
+    return compression_key(config) + dedup_key(config) + generated_key(config)
 
 
 def build(
-    snapshot: Snapshot,
+    snapshot: AnySnapshot,
     filtered: FilteredSnapshot,
     config: Config,
     cancel: CancelToken | None = None,
+    files: FileStore | None = None,
 ) -> BuiltArtifacts:
     check_cancel(cancel)
     cfg = config.normalized()
     out = get_output_paths(cfg.project_root, cfg.outputs)
 
-    old_transcript = ""
-    # Try to read old transcript for diffing.
-    if out.transcript_path.exists():
-        try:
-            old_transcript = out.transcript_path.read_text(
-                encoding="utf-8", errors="ignore"
-            )
-        except Exception:
-            old_transcript = ""
+    # The header (and its directory tree) is streamed too
+    tree = iter_tree(
+        snapshot, filtered, cfg.tree_max_depth, cfg.tree_max_entries, cancel
+    )
+    header_length = header_lines = 0
 
-    tree_text = render_tree(snapshot, filtered)
-    check_cancel(cancel)
+    def header() -> Iterator[bytes]:
+        nonlocal header_length, header_lines
+        for part in iter_header(cfg.project_root.name, tree):
+            data = encode_text(part)
+            header_length += len(data)
+            header_lines += len(part.splitlines())  # parts end lines
+            yield data
 
-    transcript_text = render_transcript(
-        cfg.project_root.name, tree_text, filtered.files_to_read, cfg
-    )
-    check_cancel(cancel)
+    # Sections of files whose content hash is unchanged are copied from the
+    # previous transcript instead of being read and rendered again
+    previous = None
+    if cfg.incremental_build and files is not None:
+        previous = load_section_index(
+            out.section_index_path, out.transcript_path, section_render_key(cfg)
+        )
 
-    diff_text = unified_diff_text(old_transcript, transcript_text)
+    sections: list[SectionEntry] = []
+    dedup = Deduper(cfg) if cfg.dedup != "off" and files is not None else None
+    old = open(out.transcript_path, "rb") if previous is not None else None
+    try:
+        # Stream the transcript into a staged file next to the final one;
+        # only one file entry is in memory at a time.
+        chunks = _iter_sections(
+            snapshot,
+            filtered,
+            cfg,
+            header(),
+            files,
+            previous,
+            old,
+            sections,
+            dedup,
+            cancel,
+        )
+        h = hashlib.blake2b(digest_size=16)
+        # Staged in the out dir; write_built moves it into a new generation
+        staged = stage_chunks(
+            out.out_dir / cfg.outputs.transcript_name,
+            hashed_chunks(chunks, h),
+            cfg.durability,
+        )
+        try:
+            check_cancel(cancel)
+            transcript_bytes = os.path.getsize(staged)
+            if previous is not None:
+                # Both layouts are known: only changed sections (and the
+                # context lines around them) are read back for the diff
+                diff_text = unified_diff_sections(
+                    _section_refs(
+                        out.transcript_path,
+                        previous.header_length,
+                        previous.header_lines,
+                        list(previous.sections.values()),
+                    ),
+                    _section_refs(staged, header_length, header_lines, sections),
+                )
+            else:
+                # Diffed section by section from disk; a missing previous
+                # transcript (first run) yields no diff.
+                diff_text = unified_diff_files(out.transcript_path, staged)
+        except BaseException:
+            discard_staged(staged)
+            raise
+    finally:
+        if old is not None:
+            old.close()
 
     return BuiltArtifacts(
-        transcript_text=transcript_text,
+        transcript_path=staged,
+        transcript_bytes=transcript_bytes,
+        transcript_blake2b=h.hexdigest(),
         diff_text=diff_text,
         files_to_write=filtered.files_to_read,
+        header_length=header_length,
+        header_lines=header_lines,
+        sections=sections,
+        deduplicated=dedup.duplicates if dedup is not None else 0,
     )
+
+
+def _iter_sections(
+    snapshot: AnySnapshot,
+    filtered: FilteredSnapshot,
+    cfg: Config,
+    header: Iterator[bytes],
+    files: FileStore | None,
+    previous: SectionIndex | None,
+    old: BinaryIO | None,
+    sections: list[SectionEntry],
+    dedup: Deduper | None,
+    cancel: CancelToken | None,
+) -> Iterator[bytes]:
+    # Yields the transcript as bytes and records each section's byte range
+    root = cfg.project_root
+    read_raw: Callable[[Path], str] = (
+        files.reader(snapshot.nodes) if files is not None else read_text_safe
+    )
+
+    def read(p: Path) -> str:
+        # [compress] stage: per file, on the read-ahead threads
+        reason = filtered.generated.get(p, "")
+        return packed_text(p.relative_to(root), read_raw(p), cfg, reason, cancel)
+
+    # Duplicates are found in transcript order; near-dup sketches need every
+    # file's content, cached sections included
+    near = dedup is not None and dedup.near
+
+    def dedupable(p: Path) -> bool:
+        node = snapshot.nodes.get(p)
+        return (
+            dedup is not None
+            and node is not None
+            and node.size_bytes >= dedup.min_bytes
+        )
+
+    # Big files are streamed block by block into the output when their text
+    # would be written unchanged
+    direct = not compression_key(cfg)
+
+    def render(
+        p: Path,
+    ) -> tuple[str, SectionEntry | None, SectionData | None, int, Sketch]:
+        rel = p.relative_to(root)
+        node = snapshot.nodes.get(p)
+        digest = files.digest(node) if files is not None and node else None
+        content = read(p) if near and dedupable(p) else None
+        sk = sketch(content) if content is not None else ()
+        if previous is not None and digest is not None:
+            hit = previous.sections.get(rel.as_posix())
+            if hit is not None and hit.blake2b == digest:
+                return digest, hit, None, hit.lines, sk
+        if (
+            direct
+            and files is not None
+            and node is not None
+            and digest is not None
+            and content is None
+            and p not in filtered.generated
+            and node.size_bytes >= STREAM_THRESHOLD
+            and files.encoding(node) == "utf-8"
+        ):
+            streamed = stream_text(p, cancel)
+            if streamed is not None:
+                section = _StreamedSection.of(rel, streamed)
+                return digest, None, section, section.lines, sk
+        text = render_section(rel, read(p) if content is None else content)
+        data = encode_text(text)
+        return digest or content_digest(data), None, data, len(text.splitlines()), sk
+
+    offset = 0
+    for data in header:
+        offset += len(data)
+        yield data
+    # Reads run ahead on cfg.read_workers threads; output order is files'
+    for p, (digest, hit, data, lines, sk) in read_ahead(
+        filtered.files_to_read, render, cfg.read_workers, cancel
+    ):
+        rel = p.relative_to(root)
+        if dedup is not None and dedupable(p):
+            dup = dedup.find(digest, sk)
+            section = _duplicate_section(rel, p, dup, read, previous, old)
+            if section is not None:
+                if isinstance(data, _StreamedSection):
+                    data.text.close()
+                dedup.duplicates += 1
+                digest, hit, (data, lines) = dup.digest, None, section
+            else:
+                dedup.add(rel.as_posix(), p, digest, sk)
+        if hit is not None and old is not None:
+            data = _copy_section(old, hit, rel)
+        if data is None:
+            text = render_section(rel, read(p))
+            data, lines = encode_text(text), len(text.splitlines())
+        entry = SectionEntry(rel.as_posix(), digest, offset, len(data), lines)
+        sections.append(entry)
+        offset += len(data)
+        if isinstance(data, _StreamedSection):
+            yield from data.chunks()
+        else:
+            yield data
+
+
+class _StreamedSection(NamedTuple):
+    # A section whose content is streamed from its file
+    head: bytes
+    text: StreamedText
+    tail: bytes
+    lines: int
+
+    @classmethod
+    def of(cls, rel: Path, text: StreamedText) -> _StreamedSection:
+        head, tail = section_parts(rel)
+        lines = line_breaks(head) + text.breaks + line_breaks(tail)
+        return cls(encode_text(head), text, encode_text(tail), lines)
+
+    def __len__(self) -> int:
+        return len(self.head) + self.text.size + len(self.tail)
+
+    def chunks(self) -> Iterator[bytes]:
+        yield self.head
+        yield from self.text.chunks()
+        yield self.tail
+
+
+SectionData = Union[bytes, _StreamedSection]
+
+
+def _duplicate_section(
+    rel: Path,
+    p: Path,
+    dup: DupRef | None,
+    read: Callable[[Path], str],
+    previous: SectionIndex | None,
+    old: BinaryIO | None,
+) -> tuple[bytes, int] | None:
+    # Bytes and line count of a duplicate's section, copied from the last
+    # run when it referenced the same canonical content
+    if dup is None:
+        return None
+    hit = previous.sections.get(rel.as_posix()) if previous is not None else None
+    if hit is not None and hit.blake2b == dup.digest and old is not None:
+        data = _copy_section(old, hit, rel)
+        if data is not None:
+            return data, hit.lines
+    if dup.exact:
+        text = render_duplicate(rel, dup)
+    else:
+        text = render_duplicate(rel, dup, read(p), read(dup.path))
+    if text is None:
+        return None
+    return encode_text(text), len(text.splitlines())
+
+
+def _copy_section(old: BinaryIO, hit: SectionEntry, rel: Path) -> bytes | None:
+    # Bytes of a previously rendered section; None if they do not look like
+    # that file's section (the transcript changed under the index)
+    try:
+        old.seek(hit.offset)
+        data = old.read(hit.length)
+    except OSError:
+        return None
+    head, tail = (encode_text(s) for s in section_parts(rel))
+    if len(data) != hit.length or not data.startswith(head) or not data.endswith(tail):
+        return None
+    return data
+
+
+def _section_refs(
+    path: Path, header_length: int, header_lines: int, entries: list[SectionEntry]
+) -> list[SectionRef]:
+    def loader(offset: int, length: int) -> Callable[[], list[str]]:
+        def load() -> list[str]:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return decode_text(f.read(length)).splitlines()
+
+        return load
+
+    with open(path, "rb") as f:
+        head = f.read(header_length)
+    refs = [
+        SectionRef("", content_digest(head), header_lines, loader(0, header_length))
+    ]
+    for e in entries:
+        refs.append(SectionRef(e.path, e.blake2b, e.lines, loader(e.offset, e.length)))
+    return refs
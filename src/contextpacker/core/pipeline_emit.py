@@ -3,44 +3,98 @@ from dataclasses import dataclass
 from pathlib import Path
 
 from .config import Config
-from .model import BuiltArtifacts, Snapshot, FilteredSnapshot
-from ..io.out_paths import get_output_paths
-from ..io.write_atomic import write_text_atomic
+from .model import BuiltArtifacts, FilteredSnapshot
+from .compact_model import AnySnapshot
+from ..io.generations import (
+    discard_generation,
+    new_generation,
+    prune_generations,
+    publish_generation,
+)
+from ..io.write_atomic import commit_staged, encode_text, write_bytes_atomic
 from ..io.manifest import build_manifest, write_manifest_atomic
+from ..io.file_store import FileStore, content_digest
+from ..io.section_index import save_section_index
+from .pipeline_build import section_render_key
 
 
 @dataclass(frozen=True)
 class Artifacts:
-    transcript_text: str
+    transcript_bytes: int
     diff_text: str
     transcript_path: Path
     changes_path: Path
     manifest_path: Path
+    files_included: int = 0
+    deduplicated: int = 0
+    generation: int = 0
 
 
 def write_built(
     built: BuiltArtifacts,
-    snapshot: Snapshot,
+    snapshot: AnySnapshot,
     filtered: FilteredSnapshot,
     config: Config,
+    files: FileStore | None = None,
 ) -> Artifacts:
     cfg = config.normalized()
-    out = get_output_paths(cfg.project_root, cfg.outputs)
 
-    # ensure out dir exists + write artifacts
-    write_text_atomic(out.transcript_path, built.transcript_text)
-    write_text_atomic(out.changes_path, built.diff_text)
+    # One generation: every artifact goes into a new directory, which only
+    # becomes current once the manifest (recording each artifact's size and
+    # hash) is in place; see io/generations.py
+    out = new_generation(cfg.project_root, cfg.outputs)
+    try:
+        commit_staged(built.transcript_path, out.transcript_path)
+        diff_data = encode_text(built.diff_text)
+        write_bytes_atomic(out.changes_path, diff_data, cfg.durability)
+        if cfg.incremental_build:
+            save_section_index(
+                out.section_index_path,
+                out.transcript_path,
+                built.header_length,
+                built.header_lines,
+                built.sections,
+                section_render_key(cfg),
+            )
 
-    manifest_path = out.out_dir / "manifest.json"
-    manifest = build_manifest(cfg, snapshot, filtered, out, built.files_to_write)
-    write_manifest_atomic(manifest_path, manifest)
+        manifest = build_manifest(
+            cfg,
+            snapshot,
+            filtered,
+            out,
+            built.files_to_write,
+            files,
+            built.deduplicated,
+        )
+        manifest["generation"] = {
+            "id": out.generation,
+            "artifacts": {
+                cfg.outputs.transcript_name: {
+                    "size": built.transcript_bytes,
+                    "blake2b": built.transcript_blake2b,
+                },
+                cfg.outputs.changes_name: {
+                    "size": len(diff_data),
+                    "blake2b": content_digest(diff_data),
+                },
+            },
+        }
+        write_manifest_atomic(out.manifest_path, manifest, cfg.durability)
+        publish_generation(out, cfg.durability)
+    except BaseException:
+        discard_generation(out)
+        raise
+    prune_generations(out, cfg.outputs)
 
     return Artifacts(
-        transcript_text=built.transcript_text,
+        transcript_bytes=built.transcript_bytes,
         diff_text=built.diff_text,
         transcript_path=out.transcript_path,
         changes_path=out.changes_path,
-        manifest_path=manifest_path,
+        manifest_path=out.manifest_path,
+        files_included=len(built.files_to_write),
+        deduplicated=built.deduplicated,
+        generation=out.generation,
     )
 
 
@@ -1,19 +1,147 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List, NamedTuple
 import os
+import stat
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from .errors import InvalidProjectRoot
 from .model import Node, Snapshot
+from .compact_model import CompactSnapshot, ROOT_ID
 from .cancel import CancelToken, check_cancel
+from ..policy.ignore_spec import IgnoreSpec
+from ..io.dir_cache import DirListingCache, RawEntry
 
+# keep(dir_prefix, name, is_dir) -> bool; dir_prefix is the directory's
+# rel path with a trailing "/", or "" for the project root
+KeepFn = Callable[[str, str, bool], bool]
 
-def enumerate_snapshot(
-    project_root: Path, cancel: CancelToken | None = None
-) -> Snapshot:
+# (abs path, rel path, abs str, rel prefix, mtime_ns) of a directory to scan
+_DirJob = tuple[Path, Path, str, str, int]
+
+
+class ScanEntry(NamedTuple):
+    name: str
+    path: str  # absolute, as returned by DirEntry.path
+    is_dir: bool
+    descend: bool  # False for symlinked directories (os.walk semantics)
+    size_bytes: int
+    mtime_ns: int
+
+
+def scan_dir(
+    dir_path: str,
+    dir_prefix: str,
+    keep: KeepFn | None,
+    cache: DirListingCache | None = None,
+    dir_mtime_ns: int | None = None,
+) -> list[ScanEntry]:
+    # One scandir per directory; type comes from the cached d_type and
+    # DirEntry.stat() is the only stat issued per entry.
+    if cache is not None:
+        listing = cache.get(dir_prefix, dir_mtime_ns)
+        if listing is not None:
+            return _restat_listing(dir_path, dir_prefix, keep, listing)
+
+    out: list[ScanEntry] = []
+    raw: list[RawEntry] = []
+    try:
+        it = os.scandir(dir_path)
+    except OSError:
+        return out
+    with it:
+        for e in it:
+            try:
+                is_dir = e.is_dir()
+                is_link = e.is_symlink()
+            except OSError:
+                continue
+            raw.append((e.name, is_dir, is_link))
+            if keep is not None and not keep(dir_prefix, e.name, is_dir):
+                continue
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            descend = is_dir and not is_link
+            out.append(
+                ScanEntry(e.name, e.path, is_dir, descend, st.st_size, st.st_mtime_ns)
+            )
+    if cache is not None:
+        cache.put(dir_prefix, dir_mtime_ns, raw)
+    out.sort(key=lambda x: x.name)
+    return out
+
+
+def _restat_listing(
+    dir_path: str, dir_prefix: str, keep: KeepFn | None, listing: list[RawEntry]
+) -> list[ScanEntry]:
+    # Directory unchanged since it was cached: skip the listing, keep the
+    # per-entry stat so sizes/mtimes match a full walk exactly.
+    out: list[ScanEntry] = []
+    for name, is_dir, is_link in listing:
+        if keep is not None and not keep(dir_prefix, name, is_dir):
+            continue
+        path = os.path.join(dir_path, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if is_link:
+            # a symlink's target may change type without touching the dir
+            is_dir = stat.S_ISDIR(st.st_mode)
+        out.append(
+            ScanEntry(
+                name, path, is_dir, is_dir and not is_link, st.st_size, st.st_mtime_ns
+            )
+        )
+    out.sort(key=lambda x: x.name)
+    return out
+
+
+def make_keep(
+    ignore: IgnoreSpec | None, selected_top_level: Iterable[str] | None
+) -> KeepFn | None:
+    if ignore is None and selected_top_level is None:
+        return None
+    selected = set(selected_top_level) if selected_top_level is not None else None
+
+    def keep(dir_prefix: str, name: str, is_dir: bool) -> bool:
+        if ignore is not None and ignore.is_ignored_rel(dir_prefix + name, is_dir):
+            return False
+        # Root-level files are always kept: they are candidates for
+        # include_root_text_files regardless of the selection.
+        if selected is not None and is_dir and not dir_prefix:
+            return name in selected
+        return True
+
+    return keep
+
+
+def resolve_root(project_root: Path) -> Path:
     root = Path(project_root).expanduser().resolve()
     if not root.exists() or not root.is_dir():
         raise InvalidProjectRoot(f"Not a directory: {root}")
+    return root
+
+
+def enumerate_snapshot(
+    project_root: Path,
+    cancel: CancelToken | None = None,
+    ignore: IgnoreSpec | None = None,
+    selected_top_level: Iterable[str] | None = None,
+    workers: int = 1,
+    cache: DirListingCache | None = None,
+) -> Snapshot:
+    # Policy-free by default. When `ignore` and/or `selected_top_level` are
+    # given, ignored names and unselected top-level directories are pruned
+    # while walking, so their subtrees are never listed or stat'ed.
+    # workers > 1 fans directory scans out to a thread pool; the result is
+    # identical to the serial walk. A DirListingCache skips re-listing
+    # directories whose mtime is unchanged.
+    root = resolve_root(project_root)
+    keep = make_keep(ignore, selected_top_level)
 
     nodes: Dict[Path, Node] = {}
     children: Dict[Path, List[Path]] = {}
@@ -21,50 +149,124 @@ def enumerate_snapshot(
     # include root as a node for convenience
     st = root.stat()
     nodes[root] = Node(root, Path("."), True, st.st_size, st.st_mtime_ns)
-    children[root] = []
 
-    # Walk entire tree (policy-free)
-    for dirpath, dirnames, filenames in os.walk(root):
-        check_cancel(cancel)
+    # Child paths are derived from their parent (cheaper than re-parsing a
+    # full string) and the rel prefix handed to `keep` is built by string
+    # concatenation.
+    top: _DirJob = (root, Path("."), str(root), "", st.st_mtime_ns)
 
-        d = Path(dirpath)
-        # Ensure Deterministic Order
-        dirnames.sort()
-        filenames.sort()
+    def scan(job: _DirJob) -> list[ScanEntry]:
+        return scan_dir(job[2], job[3], keep, cache, job[4])
 
-        # Record directory node if missing
-        if d not in nodes:
-            st = d.stat()
-            nodes[d] = Node(d, d.relative_to(root), True, st.st_size, st.st_mtime_ns)
-            children.setdefault(d, [])
+    def record(job: _DirJob, entries: list[ScanEntry]) -> list[_DirJob]:
+        d, d_rel, _, d_prefix, _ = job
+        kids: list[Path] = []
+        subdirs: list[_DirJob] = []
+        for e in entries:
+            p = d / e.name
+            rel = d_rel / e.name
+            nodes[p] = Node(p, rel, e.is_dir, e.size_bytes, e.mtime_ns)
+            kids.append(p)
+            if e.is_dir:
+                children[p] = []
+            if e.descend:
+                sub = d_prefix + e.name + "/"
+                subdirs.append((p, rel, e.path, sub, e.mtime_ns))
+        children[d] = kids
+        return subdirs
 
-        # Register children container
-        children.setdefault(d, [])
+    if workers <= 1:
+        stack = [top]
+        while stack:
+            check_cancel(cancel)
+            job = stack.pop()
+            subdirs = record(job, scan(job))
+            # Reverse push keeps a depth-first, name-ordered traversal
+            stack.extend(reversed(subdirs))
+    else:
+        _walk_parallel(top, scan, record, workers, cancel)
 
-        for name in dirnames:
-            p = d / name
-            try:
-                st = p.stat()
-            except OSError:
-                continue
-            nodes[p] = Node(p, p.relative_to(root), True, st.st_size, st.st_mtime_ns)
-            children.setdefault(p, [])
-            children[d].append(p)
+    return Snapshot(root=root, nodes=nodes, children=children)
 
-        for name in filenames:
-            p = d / name
-            try:
-                st = p.stat()
-            except OSError:
-                continue
-            nodes[p] = Node(p, p.relative_to(root), False, st.st_size, st.st_mtime_ns)
-            children[d].append(p)
 
-    # Deterministic children ordering
-    for k, v in children.items():
-        check_cancel(cancel)
-        children[k] = sorted(v, key=lambda x: str(x))
+def _walk_parallel(
+    top: _DirJob,
+    scan: Callable[[_DirJob], list[ScanEntry]],
+    record: Callable[[_DirJob, list[ScanEntry]], list[_DirJob]],
+    workers: int,
+    cancel: CancelToken | None,
+) -> None:
+    # Scans (scandir + stat, which release the GIL) run on the pool; node
+    # construction stays on this thread. Children lists are already sorted
+    # per directory, so completion order does not affect the result.
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cp-scan")
+    try:
+        pending = {pool.submit(scan, top): top}
+        while pending:
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            check_cancel(cancel)
+            for fut in done:
+                job = pending.pop(fut)
+                for sub in record(job, fut.result()):
+                    pending[pool.submit(scan, sub)] = sub
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    children[root] = sorted(children.get(root, []), key=lambda x: str(x))
 
-    return Snapshot(root=root, nodes=nodes, children=children)
+def enumerate_compact(
+    project_root: Path,
+    cancel: CancelToken | None = None,
+    ignore: IgnoreSpec | None = None,
+    selected_top_level: Iterable[str] | None = None,
+    workers: int = 1,
+    cache: DirListingCache | None = None,
+) -> CompactSnapshot:
+    # Same walk and pruning as enumerate_snapshot, stored column-wise.
+    # Directories are consumed in FIFO (breadth-first) order so each one's
+    # children get a contiguous id range; with workers > 1 later scans are
+    # prefetched on the pool while earlier ones are recorded.
+    root = resolve_root(project_root)
+    keep = make_keep(ignore, selected_top_level)
+
+    snap = CompactSnapshot(root)
+    interned: dict[str, int] = {}
+    st = root.stat()
+    snap.add(ROOT_ID, -1, True, st.st_size, st.st_mtime_ns)
+
+    pool = (
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cp-scan")
+        if workers > 1
+        else None
+    )
+
+    def submit(d_str: str, d_prefix: str, mtime_ns: int):
+        if pool is None:
+            return None
+        return pool.submit(scan_dir, d_str, d_prefix, keep, cache, mtime_ns)
+
+    try:
+        top = (ROOT_ID, str(root), "", st.st_mtime_ns)
+        queue: deque = deque([(*top, submit(*top[1:]))])
+        while queue:
+            check_cancel(cancel)
+            d_id, d_str, d_prefix, d_mtime, fut = queue.popleft()
+            if fut is not None:
+                entries = fut.result()
+            else:
+                entries = scan_dir(d_str, d_prefix, keep, cache, d_mtime)
+
+            snap.child_start[d_id] = len(snap)
+            snap.child_count[d_id] = len(entries)
+            for e in entries:
+                name_id = interned.setdefault(e.name, len(interned))
+                if name_id == len(snap.names):
+                    snap.names.append(e.name)
+                i = snap.add(d_id, name_id, e.is_dir, e.size_bytes, e.mtime_ns)
+                if e.descend:
+                    job = (i, e.path, d_prefix + e.name + "/", e.mtime_ns)
+                    queue.append((*job, submit(*job[1:])))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return snap
@@ -1,30 +1,55 @@
 from __future__ import annotations
 from pathlib import Path
+from typing import Iterator
 
 from .config import Config
-from .model import Snapshot, FilteredSnapshot
-from ..policy.ignore_spec import compile_ignore
+from .errors import ContextPackerError
+from .model import FilteredSnapshot, Node
+from .compact_model import AnySnapshot
+from ..policy.ignore_spec import IgnoreSpec, compile_ignore
+from ..policy.budget import (
+    BudgetItem,
+    count_tokens,
+    count_total,
+    select_within_budget,
+)
 from ..policy.selection import compute_tree_roots_and_visibility, compute_files_to_read
-from ..io.file_read import is_probably_text
+from ..io.file_store import FileStore
+from ..io.file_read import read_ahead
+from ..render.transcript_render import iter_header
+from ..render.tree_render import iter_tree
 from .cancel import CancelToken, check_cancel
 
 
+def new_file_store(cfg: Config) -> FileStore:
+    # Keeps decoded text for up to one transcript's worth of files
+    return FileStore(cfg.max_file_bytes, cfg.max_total_bytes)
+
+
 def filter_snapshot(
-    snapshot: Snapshot, config: Config, cancel: CancelToken | None = None
+    snapshot: AnySnapshot,
+    config: Config,
+    cancel: CancelToken | None = None,
+    ignore: IgnoreSpec | None = None,
+    files: FileStore | None = None,
 ) -> FilteredSnapshot:
     check_cancel(cancel)
     cfg = config.normalized()
-    ignore = compile_ignore(cfg.project_root, cfg.preset)
+    if ignore is None:
+        ignore = compile_ignore(cfg.project_root, cfg.preset)
+    if files is None:
+        files = new_file_store(cfg)
 
-    tree_roots, visible_nodes = compute_tree_roots_and_visibility(
+    tree_roots, visible_nodes, visible_children = compute_tree_roots_and_visibility(
         snapshot=snapshot,
         config=cfg,
         ignore=ignore,
+        files=files,
     )
 
     check_cancel(cancel)
 
-    files = compute_files_to_read(
+    candidates = compute_files_to_read(
         snapshot=snapshot,
         config=cfg,
         ignore=ignore,
@@ -38,8 +63,9 @@ def filter_snapshot(
     # Output directory must be excluded from the files to read
     out_dir = cfg.project_root / cfg.outputs.out_dir_name
 
-    truncated = False
-    for i, p in enumerate(files):
+    # Cheap gates first (no I/O)
+    sized: list[Node] = []
+    for i, p in enumerate(candidates):
         # periodic check
         if i % 100 == 0:
             check_cancel(cancel)
@@ -57,7 +83,29 @@ def filter_snapshot(
             continue
         if node.size_bytes > cfg.max_file_bytes:
             continue
-        if not is_probably_text(p):
+        sized.append(node)
+
+    if cfg.token_budget is not None:
+        return _filter_by_budget(
+            snapshot,
+            cfg,
+            sized,
+            files,
+            visible_nodes,
+            tree_roots,
+            visible_children,
+            cancel,
+        )
+
+    # Text classification reads each file once; reads run ahead on a pool
+    truncated = False
+    generated: dict[Path, str] = {}
+    excluded: list[Path] = []
+    for node, reason in _text_files(sized, files, cfg, excluded, cancel):
+        if reason:
+            # Summarized: takes next to no room, not counted
+            generated[node.path] = reason
+            out_files.append(node.path)
             continue
 
         # Check total limits
@@ -67,13 +115,107 @@ def filter_snapshot(
             break
 
         current_total_bytes += node.size_bytes
-        out_files.append(p)
+        out_files.append(node.path)
 
     out_files = sorted(out_files, key=lambda x: str(x))
     return FilteredSnapshot(
         root=snapshot.root,
         visible_nodes=visible_nodes,
         tree_roots=tree_roots,
+        visible_children=visible_children,
         files_to_read=out_files,
         truncated_by_total=truncated,
+        generated=generated,
+        dropped_as_generated=sorted(excluded, key=lambda x: str(x)),
+    )
+
+
+def _text_files(
+    sized: list[Node],
+    files: FileStore,
+    cfg: Config,
+    excluded: list[Path],
+    cancel: CancelToken | None,
+) -> Iterator[tuple[Node, str]]:
+    # Text files with why they look generated ("" if not). The scan only
+    # runs when cfg asks for it, on the text read to classify the file;
+    # generated files being excluded go to excluded instead.
+    detect = cfg.generated_files != "keep"
+
+    def classify(node: Node) -> tuple[bool, str]:
+        if not files.is_text(node):
+            return False, ""
+        return True, files.generated(node) if detect else ""
+
+    for node, (is_text, reason) in read_ahead(
+        sized, classify, cfg.read_workers, cancel
+    ):
+        if not is_text:
+            continue
+        if reason and cfg.generated_files == "exclude":
+            excluded.append(node.path)
+            continue
+        yield node, reason
+
+
+def _filter_by_budget(
+    snapshot: AnySnapshot,
+    cfg: Config,
+    sized: list[Node],
+    files: FileStore,
+    visible_nodes: set[Path],
+    tree_roots: list[Path],
+    visible_children: dict[Path, list[Path]],
+    cancel: CancelToken | None,
+) -> FilteredSnapshot:
+    # Token budget replaces the byte total: every text file is counted, then
+    # the budget picks which ones to pack. The header (and directory tree)
+    # goes into the transcript whatever is picked, so it is paid for first.
+    tree = FilteredSnapshot(
+        root=snapshot.root,
+        visible_nodes=visible_nodes,
+        tree_roots=tree_roots,
+        visible_children=visible_children,
+        files_to_read=[],
+    )
+    lines = iter_tree(
+        snapshot, tree, cfg.tree_max_depth, cfg.tree_max_entries, cancel
+    )
+    header = count_total(iter_header(cfg.project_root.name, lines), cfg, cancel)
+    budget = cfg.token_budget or 0
+    if header > budget:
+        raise ContextPackerError(
+            f"The transcript header alone takes ~{header} tokens, over the "
+            f"token budget of {budget}; raise the budget or collapse the "
+            "directory tree (tree_max_depth / tree_max_entries)."
+        )
+
+    text_nodes: list[Node] = []
+    generated: dict[Path, str] = {}
+    excluded: list[Path] = []
+    for node, reason in _text_files(sized, files, cfg, excluded, cancel):
+        if reason:
+            generated[node.path] = reason
+        text_nodes.append(node)
+    counts = count_tokens(text_nodes, files, cfg, cancel, generated)
+    check_cancel(cancel)
+    items = [
+        BudgetItem(n.path, n.rel_path.as_posix(), t)
+        for n, t in zip(text_nodes, counts)
+    ]
+    result = select_within_budget(
+        items, budget - header, cfg.budget_strategy, cfg.priorities
+    )
+    kept = set(result.selected)
+    return FilteredSnapshot(
+        root=snapshot.root,
+        visible_nodes=visible_nodes,
+        tree_roots=tree_roots,
+        visible_children=visible_children,
+        files_to_read=sorted(result.selected, key=lambda x: str(x)),
+        truncated_by_total=bool(result.dropped),
+        dropped_by_budget=sorted(result.dropped, key=lambda x: str(x)),
+        total_tokens=header + result.tokens,
+        generated={p: r for p, r in generated.items() if p in kept},
+        dropped_as_generated=sorted(excluded, key=lambda x: str(x)),
     )
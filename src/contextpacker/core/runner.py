@@ -1,38 +1,122 @@
 from __future__ import annotations
 from .config import Config
-from .pipeline_enumerate import enumerate_snapshot
-from .pipeline_filter import filter_snapshot
+from .pipeline_enumerate import enumerate_snapshot, enumerate_compact
+from .pipeline_filter import filter_snapshot, new_file_store
 from .pipeline_build import build
 from .pipeline_emit import write_built, Artifacts
-from .model import PreviewArtifacts
+from .model import FilteredSnapshot, PreviewArtifacts
+from .compact_model import AnySnapshot
 from .cancel import CancelToken, check_cancel
+from .session import RunSession
 
+from ..policy.ignore_spec import IgnoreSpec, compile_ignore
 from ..io.out_paths import get_output_paths
-from ..io.manifest import build_manifest
+from ..io.dir_cache import load_dir_cache, save_dir_cache
+from ..io.manifest import build_manifest, load_manifest_entries, unchanged_nodes
+from ..policy.generated import packed_text
 from ..render.tree_render import render_tree
-from ..io.file_read import read_text_safe
-
+from ..io.file_store import FileStore
+from ..io.write_atomic import discard_staged
+
+
+def _enumerate(
+    cfg: Config,
+    cancel: CancelToken | None,
+    ignore: IgnoreSpec,
+    persist_cache: bool,
+) -> AnySnapshot:
+    # Prune ignored and unselected subtrees while walking; filtering applies
+    # the same policy afterwards, so the result is unchanged.
+    enumerate_fn = enumerate_compact if cfg.compact_snapshot else enumerate_snapshot
+
+    cache = None
+    if cfg.snapshot_cache:
+        cache_path = get_output_paths(cfg.project_root, cfg.outputs).snapshot_cache_path
+        cache = load_dir_cache(cache_path)
+
+    snap = enumerate_fn(
+        cfg.project_root,
+        cancel,
+        ignore=ignore,
+        selected_top_level=cfg.selected_top_level,
+        workers=cfg.enumerate_workers,
+        cache=cache,
+    )
 
-def run(config: Config, cancel: CancelToken | None = None) -> Artifacts:
+    # Preview stays a dry run: it reads the cache but never writes it
+    if cache is not None and persist_cache:
+        save_dir_cache(cache_path, cache)
+    return snap
+
+
+def _snapshot_and_filter(
+    cfg: Config,
+    cancel: CancelToken | None,
+    session: RunSession | None,
+    persist_cache: bool,
+) -> tuple[AnySnapshot, FilteredSnapshot, FileStore]:
+    # Reuse the session's last result when it is still valid for cfg
+    if session is not None:
+        hit = session.lookup(cfg, cancel)
+        if hit is not None:
+            return hit
+
+    # One compiled policy per run: gitignore files loaded while walking are
+    # reused by the filter
+    ignore = compile_ignore(cfg.project_root, cfg.preset)
+    snap = _enumerate(cfg, cancel, ignore, persist_cache)
+    files = new_file_store(cfg)
+    # Files unchanged since the last manifest are not re-read to classify
+    out = get_output_paths(cfg.project_root, cfg.outputs)
+    for node, entry in unchanged_nodes(load_manifest_entries(out.manifest_path), snap):
+        files.seed(
+            node, entry.blake2b, entry.tokens, entry.encoding, entry.generated
+        )
+    filt = filter_snapshot(snap, cfg, cancel, ignore, files)
+    if session is not None:
+        session.store(cfg, snap, filt, files)
+    return snap, filt, files
+
+
+def run(
+    config: Config,
+    cancel: CancelToken | None = None,
+    session: RunSession | None = None,
+) -> Artifacts:
     check_cancel(cancel)
     cfg = config.normalized()
 
-    snap = enumerate_snapshot(cfg.project_root, cancel)
-    filt = filter_snapshot(snap, cfg, cancel)
+    # Create the out dir before the snapshot, so creating it does not move
+    # the root's mtime and invalidate the session right after the first run
+    get_output_paths(cfg.project_root, cfg.outputs).out_dir.mkdir(
+        parents=True, exist_ok=True
+    )
+
+    snap, filt, files = _snapshot_and_filter(
+        cfg, cancel, session, persist_cache=True
+    )
 
-    # build (render in memory)
-    built = build(snap, filt, cfg, cancel)
+    # build (transcript streamed to a staged file)
+    built = build(snap, filt, cfg, cancel, files)
 
     # write to disk (atomic)
-    return write_built(built, snap, filt, cfg)
+    try:
+        return write_built(built, snap, filt, cfg, files)
+    finally:
+        discard_staged(built.transcript_path)
 
 
-def run_preview(config: Config, cancel: CancelToken | None = None) -> PreviewArtifacts:
+def run_preview(
+    config: Config,
+    cancel: CancelToken | None = None,
+    session: RunSession | None = None,
+) -> PreviewArtifacts:
     check_cancel(cancel)
     cfg = config.normalized()
 
-    snap = enumerate_snapshot(cfg.project_root, cancel)
-    filt = filter_snapshot(snap, cfg, cancel)
+    snap, filt, files = _snapshot_and_filter(
+        cfg, cancel, session, persist_cache=False
+    )
 
     # Compute stats for preview
     files_included = filt.files_to_read
@@ -52,11 +136,11 @@ def run_preview(config: Config, cancel: CancelToken | None = None) -> PreviewArt
 
     # Preview tree
     check_cancel(cancel)
-    tree_text = render_tree(snap, filt)
+    tree_text = render_tree(snap, filt, cfg.tree_max_depth, cfg.tree_max_entries)
 
     # Preview snippet (optional)
     out_paths = get_output_paths(cfg.project_root, cfg.outputs)
-    manifest = build_manifest(cfg, snap, filt, out_paths, valid_files)
+    manifest = build_manifest(cfg, snap, filt, out_paths, valid_files, files)
 
     truncated = filt.truncated_by_total
 
@@ -65,11 +149,12 @@ def run_preview(config: Config, cancel: CancelToken | None = None) -> PreviewArt
     # e.g. first 3 files
     for p in valid_files[:3]:
         check_cancel(cancel)
-        content = read_text_safe(p)
+        rel = p.relative_to(cfg.project_root)
+        text = files.read_text(snap.nodes[p])
+        content = packed_text(rel, text, cfg, filt.generated.get(p, ""), cancel)
         # truncate large files for preview snippet
         if len(content) > 1000:
             content = content[:1000] + "\n... (truncated for preview)"
-        rel = p.relative_to(cfg.project_root)
         snippet_parts.append(f"File: {rel}\n[\n{content}\n]\n{'-' * 20}")
 
     transcript_preview = "\n".join(snippet_parts)
@@ -85,4 +170,7 @@ def run_preview(config: Config, cancel: CancelToken | None = None) -> PreviewArt
         manifest_dict=manifest,
         transcript_preview_text=transcript_preview,
         truncated=truncated,
+        dropped_files=list(filt.dropped_by_budget),
+        total_tokens=filt.total_tokens,
+        generated_files=len(filt.generated) + len(filt.dropped_as_generated),
     )
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+import stat
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .config import Config
+from .model import FilteredSnapshot, Node
+from .compact_model import AnySnapshot
+from .cancel import CancelToken, check_cancel
+from ..io.file_store import FileStore
+
+
+@dataclass
+class RunSession:
+    # Last snapshot + filter result, reused by the next run when the config
+    # is equal and nothing they depend on has changed on disk.
+    config: Config | None = None
+    snapshot: AnySnapshot | None = None
+    filtered: FilteredSnapshot | None = None
+    files: FileStore | None = None  # classification + cached file contents
+    _ignore_stamps: dict[Path, tuple[int, int] | None] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def store(
+        self,
+        config: Config,
+        snapshot: AnySnapshot,
+        filtered: FilteredSnapshot,
+        files: FileStore,
+    ) -> None:
+        stamps = {p: _stamp(p) for p in _ignore_sources(snapshot.root)}
+        with self._lock:
+            self.config = config.normalized()
+            self.snapshot = snapshot
+            self.filtered = filtered
+            self.files = files
+            self._ignore_stamps = stamps
+
+    def clear(self) -> None:
+        with self._lock:
+            self.config = None
+            self.snapshot = None
+            self.filtered = None
+            self.files = None
+            self._ignore_stamps = {}
+
+    def lookup(
+        self, config: Config, cancel: CancelToken | None = None
+    ) -> tuple[AnySnapshot, FilteredSnapshot, FileStore] | None:
+        with self._lock:
+            cfg, snap, filt = self.config, self.snapshot, self.filtered
+            files, stamps = self.files, self._ignore_stamps
+        if cfg is None or snap is None or filt is None or files is None:
+            return None
+        if cfg != config.normalized():
+            return None
+        if any(_stamp(p) != st for p, st in stamps.items()):
+            return None
+        if not is_unchanged(snap, filt, cancel):
+            return None
+        return snap, filt, files
+
+    def disk_state(self, cancel: CancelToken | None = None) -> int | None:
+        # Hash of the current stamps of everything lookup() validates; two
+        # equal values a moment apart mean the tree has stopped changing.
+        with self._lock:
+            snap, filt, stamps = self.snapshot, self.filtered, self._ignore_stamps
+        if snap is None or filt is None:
+            return None
+        paths = [*stamps, snap.root, *filt.visible_nodes]
+        out = []
+        for i, p in enumerate(paths):
+            if i % 100 == 0:
+                check_cancel(cancel)
+            out.append(_stamp(p))
+        return hash(tuple(out))
+
+
+def is_unchanged(
+    snapshot: AnySnapshot,
+    filtered: FilteredSnapshot,
+    cancel: CancelToken | None = None,
+) -> bool:
+    # Cheap revalidation: one stat per visible node plus the root. A
+    # directory's mtime moves when entries are added, removed or renamed; a
+    # file's size/mtime when its content is rewritten. Nested .gitignore
+    # files are visible nodes of their directory, so edits are caught too.
+    for i, p in enumerate([snapshot.root, *filtered.visible_nodes]):
+        if i % 100 == 0:
+            check_cancel(cancel)
+        node = snapshot.nodes.get(p)
+        if node is None or _stamp(p) != (node.mtime_ns, _size_key(node)):
+            return False
+    return True
+
+
+def _ignore_sources(root: Path) -> list[Path]:
+    # Policy inputs that may not be visible nodes themselves
+    return [root / ".gitignore", root / ".git" / "info" / "exclude"]
+
+
+def _size_key(node: Node) -> int:
+    return -1 if node.is_dir else node.size_bytes
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    # (mtime_ns, size) for files, (mtime_ns, -1) for dirs, None if missing
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, -1 if stat.S_ISDIR(st.st_mode) else st.st_size
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import time
+from typing import Callable
+
+from .config import Config
+from .cancel import CancelToken, CancelledError, check_cancel
+from .pipeline_emit import Artifacts
+from .runner import run
+from .session import RunSession
+
+POLL_INTERVAL = 1.0  # seconds between change checks
+DEBOUNCE = 0.5  # the tree must be quiet this long before a repack
+MAX_SETTLE = 10.0  # a tree that never settles is still repacked this often
+
+
+def watch(
+    config: Config,
+    cancel: CancelToken | None = None,
+    session: RunSession | None = None,
+    on_update: Callable[[Artifacts], None] | None = None,
+    on_error: Callable[[Exception], None] | None = None,
+    interval: float = POLL_INTERVAL,
+    debounce: float = DEBOUNCE,
+) -> None:
+    # Keeps the output artifacts up to date until `cancel` is requested.
+    # Polling: each check is one stat per visible node against the session's
+    # snapshot; a change triggers a normal run(), which relists only changed
+    # directories and re-renders only changed files.
+    cfg = config.normalized()
+    if session is None:
+        session = RunSession()
+    try:
+        _repack(cfg, cancel, session, on_update, on_error)
+        while True:
+            _sleep(interval, cancel)
+            if session.lookup(cfg, cancel) is not None:
+                continue
+            _settle(session, cancel, debounce)
+            _repack(cfg, cancel, session, on_update, on_error)
+    except CancelledError:
+        return
+
+
+def _repack(
+    cfg: Config,
+    cancel: CancelToken | None,
+    session: RunSession,
+    on_update: Callable[[Artifacts], None] | None,
+    on_error: Callable[[Exception], None] | None,
+) -> None:
+    try:
+        artifacts = run(cfg, cancel, session)
+    except CancelledError:
+        raise
+    except Exception as e:
+        # e.g. a file vanished mid-run: start cold and retry on the next poll
+        session.clear()
+        if on_error is None:
+            raise
+        on_error(e)
+        return
+    if on_update is not None:
+        on_update(artifacts)
+
+
+def _settle(session: RunSession, cancel: CancelToken | None, debounce: float) -> None:
+    # Wait out a burst of writes (checkout, formatter, build) so it is
+    # packed once, not once per file
+    deadline = time.monotonic() + MAX_SETTLE
+    state = session.disk_state(cancel)
+    while time.monotonic() < deadline:
+        _sleep(debounce, cancel)
+        now = session.disk_state(cancel)
+        if now == state:
+            return
+        state = now
+
+
+def _sleep(seconds: float, cancel: CancelToken | None) -> None:
+    # Sleeps in short steps so a cancel request is seen promptly
+    end = time.monotonic() + seconds
+    while True:
+        check_cancel(cancel)
+        left = end - time.monotonic()
+        if left <= 0:
+            return
+        time.sleep(min(left, 0.1))
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import codecs
+
+# Text/binary classification from the first bytes of a file (the same read
+# that provides its content) plus its name. Checks are byte counts done in
+# C (translate/count/decode), cheapest first.
+
+BLOB_MIN = 1024  # smaller heads are too short to call data
+BLOB_LINE = 60  # base64 bodies wrap at 64 or 76 columns, or not at all
+MAX_CONTROL_RATIO = 0.10  # control bytes in text: form feeds, stray escapes
+
+# Recorded in the manifest; bump it when a change here can classify a file
+# differently, so entries seeded from older manifests are not trusted
+CLASSIFIER_VERSION = 1
+
+# Suffixes (lower case) that are never packed; such files are not read
+BINARY_SUFFIXES = set(
+    ".png .jpg .jpeg .gif .bmp .ico .icns .webp .tif .tiff .psd .heic "
+    ".pdf .zip .gz .tgz .bz2 .xz .7z .rar .zst .tar .jar .war .whl .egg "
+    ".class .pyc .pyo .pyd .so .dylib .dll .exe .o .obj .a .lib .wasm "
+    ".woff .woff2 .ttf .otf .eot .mp3 .mp4 .m4a .wav .flac .ogg .avi .mov "
+    ".mkv .webm .sqlite .sqlite3 .npy .npz .pkl .pickle .parquet .onnx "
+    ".pt .h5 .iso .dmg".split()
+)
+
+# Magic numbers of formats that can go a long way without a NUL byte
+_MAGIC = (
+    b"\x89PNG",
+    b"GIF87a",
+    b"GIF89a",
+    b"\xff\xd8\xff",  # JPEG
+    b"%PDF-",
+    b"PK\x03\x04",  # zip, jar, docx, ...
+    b"\x1f\x8b",  # gzip
+    b"\x7fELF",
+    b"\xca\xfe\xba\xbe",  # Java class, Mach-O fat binary
+    b"\xcf\xfa\xed\xfe",  # Mach-O
+    b"\xfd7zXZ\x00",
+    b"7z\xbc\xaf\x27\x1c",
+    b"Rar!\x1a\x07",
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"\xd0\xcf\x11\xe0",  # OLE (doc, xls, msi)
+    b"SQLite format 3\x00",
+    b"\x00asm",
+    b"OggS",
+    b"fLaC",
+    b"ID3",
+    b"wOFF",
+    b"wOF2",
+)
+
+# Longest first: the UTF-32 LE BOM starts with the UTF-16 LE one. A UTF-8
+# BOM is decoded as before (kept as U+FEFF).
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Control bytes text does not use; ISO-2022 encodings shift with SO/SI/ESC
+_TEXT_CONTROLS = b"\t\n\x0b\x0c\r\x0e\x0f\x1b"
+_CONTROL = bytes(b for b in range(32) if b not in _TEXT_CONTROLS) + b"\x7f"
+_BASE64 = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=-_\r\n"
+
+
+def binary_by_name(name: str) -> bool:
+    dot = name.rfind(".")
+    return dot > 0 and name[dot:].lower() in BINARY_SUFFIXES
+
+
+def sniff_encoding(head: bytes) -> str | None:
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding if _decodes(head, encoding) else None
+    if head.startswith(_MAGIC):
+        return None
+    n = len(head)
+    if b"\0" in head:
+        encoding = _utf16_without_bom(head)
+        return encoding if encoding and _decodes(head, encoding) else None
+    if not n:
+        return "utf-8"
+    if n - len(head.translate(None, _CONTROL)) > n * MAX_CONTROL_RATIO:
+        return None
+    # Legacy 8-bit text (not valid UTF-8) is decoded lossily, as before;
+    # random data has failed the control byte test by now
+    return None if _is_blob(head) else "utf-8"
+
+
+def _decodes(head: bytes, encoding: str) -> bool:
+    # Incremental, so a sequence cut off at the end of the head is fine
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(head)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _utf16_without_bom(head: bytes) -> str | None:
+    # ASCII-range UTF-16 has a NUL in every other byte, and only there
+    half = len(head) // 2
+    even, odd = head[0::2].count(0), head[1::2].count(0)
+    if half and odd > half * 0.3 and even <= half // 100:
+        return "utf-16-le"
+    if half and even > half * 0.3 and odd <= half // 100:
+        return "utf-16-be"
+    return None
+
+
+def _is_blob(head: bytes) -> bool:
+    # Text-safe data (base64, hex, data URIs): (almost) nothing but the
+    # base64 alphabet, in lines too long for a word list
+    allowed = len(head) // 100
+    if len(head) < BLOB_MIN or head.count(b" ") > allowed:
+        return False  # counting spaces rules out most text at memchr speed
+    if len(head.translate(None, _BASE64)) > allowed:
+        return False
+    return max(map(len, head.split(b"\n"))) >= BLOB_LINE
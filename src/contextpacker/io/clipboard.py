@@ -1,7 +1,14 @@
-import tkinter as tk
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import tkinter as tk
 
 
 def set_clipboard(text: str) -> None:
+    # tkinter is imported on use: headless installs may lack _tkinter
+    import tkinter as tk
+
     r = tk.Tk()
     r.withdraw()
     r.clipboard_clear()
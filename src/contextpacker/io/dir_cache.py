@@ -0,0 +1,81 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from pathlib import Path
+
+from .write_atomic import write_text_atomic
+
+CACHE_VERSION = 1
+
+# A directory modified within this window of the scan start may change again
+# without its mtime moving (coarse timestamps), so its listing is not kept.
+RACY_WINDOW_NS = 2_000_000_000
+
+# (name, is_dir, is_symlink) as reported by scandir, before any policy
+RawEntry = tuple[str, bool, bool]
+
+
+class DirListingCache:
+    # Directory listings keyed by rel prefix ("" for the root, "a/b/" below)
+    # and validated by the directory's mtime_ns. Only listings are cached:
+    # entries are still stat'ed on reuse, because editing a file in place
+    # does not touch its directory's mtime.
+    def __init__(self, dirs: dict[str, tuple[int, list[RawEntry]]] | None = None):
+        self._dirs = dirs or {}
+        self._seen: dict[str, tuple[int, list[RawEntry]]] = {}
+        self._lock = threading.Lock()
+        self.started_ns = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prefix: str, mtime_ns: int | None) -> list[RawEntry] | None:
+        hit = self._dirs.get(prefix)
+        with self._lock:
+            if mtime_ns is None or hit is None or hit[0] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._seen[prefix] = hit
+        return hit[1]
+
+    def put(self, prefix: str, mtime_ns: int | None, listing: list[RawEntry]) -> None:
+        if mtime_ns is None or mtime_ns >= self.started_ns - RACY_WINDOW_NS:
+            return
+        with self._lock:
+            self._seen[prefix] = (mtime_ns, listing)
+
+    def to_json(self) -> str:
+        # Only listings looked up or refreshed in this walk: ones of deleted
+        # or pruned directories are dropped, so the cache does not only grow.
+        dirs = self._seen
+        return json.dumps(
+            {
+                "version": CACHE_VERSION,
+                "dirs": {
+                    k: [m, [[n, int(d), int(s)] for n, d, s in v]]
+                    for k, (m, v) in sorted(dirs.items())
+                },
+            },
+            separators=(",", ":"),
+        )
+
+
+def load_dir_cache(path: Path) -> DirListingCache:
+    p = Path(path)
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+        if data.get("version") != CACHE_VERSION:
+            return DirListingCache()
+        dirs = {
+            k: (int(m), [(n, bool(d), bool(s)) for n, d, s in v])
+            for k, (m, v) in data["dirs"].items()
+        }
+    except Exception:
+        # Missing or corrupt cache: start cold
+        return DirListingCache()
+    return DirListingCache(dirs)
+
+
+def save_dir_cache(path: Path, cache: DirListingCache) -> None:
+    write_text_atomic(path, cache.to_json())
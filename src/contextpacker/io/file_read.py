@@ -1,19 +1,168 @@
 from __future__ import annotations
+import codecs
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, TypeVar
 
+from ..core.cancel import CancelToken, check_cancel
+from ..core.errors import ReadError
 
-def is_probably_text(path: Path) -> bool:
+T = TypeVar("T")
+R = TypeVar("R")
+
+SNIFF_BYTES = 2048
+STREAM_THRESHOLD = 1 << 20  # files this big or bigger are streamed, not read whole
+READ_BLOCK = 1 << 20  # validated / hashed / written per step
+SAMPLE_BLOCK = 1 << 16  # bytes per block of a big file's sample
+SAMPLE_BLOCKS = 4  # the head, then spread evenly up to the end
+
+# What str.splitlines() breaks at, "\r" aside (streamed text has none)
+_LINE_BREAKS = "\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def looks_binary(head: bytes) -> bool:
     # Cheap binary test: look for NULL in first chunk.
+    return b"\0" in head[:SNIFF_BYTES]
+
+
+def decode_text(data: bytes, encoding: str = "utf-8") -> str:
+    # Same result as Path.read_text(encoding=encoding, errors="ignore"),
+    # including universal-newline translation.
+    text = data.decode(encoding, errors="ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def line_breaks(text: str) -> int:
+    return sum(map(text.count, _LINE_BREAKS))
+
+
+def read_blocks(f: BinaryIO) -> Iterator[memoryview]:
+    # The rest of f in READ_BLOCK pieces, read into one reused buffer: each
+    # view is only valid until the next one is taken
+    buf = bytearray(READ_BLOCK)
+    view = memoryview(buf)
+    while n := f.readinto(buf):
+        yield view[:n]
+
+
+class StreamedText:
+    # A big text file whose bytes go into the transcript as they are: no
+    # decoded copy, no re-encode. Only made for content that decodes to
+    # itself (valid UTF-8, no "\r" to translate); see stream_text. The file
+    # stays open from validation to output, so a save that replaces it does
+    # not change what is written; one cut short in between raises ReadError.
+    def __init__(self, f: BinaryIO, size: int, breaks: int) -> None:
+        self._f = f
+        self.size = size
+        self.breaks = breaks  # line breaks as str.splitlines() counts them
+
+    def chunks(self) -> Iterator[bytes]:
+        # The validated bytes, block by block; closes the file when done
+        try:
+            self._f.seek(0)
+            left = self.size
+            for block in read_blocks(self._f):
+                data = bytes(block[:left])
+                left -= len(data)
+                yield data
+                if not left:
+                    break
+            if left:
+                raise ReadError(f"File shrank while being packed: {self._f.name}")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def stream_text(path: Path, cancel: CancelToken | None = None) -> StreamedText | None:
+    # Validates the file block by block (NUL sniff, strict UTF-8, line
+    # breaks). None means "read it as str instead".
+    if os.linesep != "\n":
+        return None  # output needs newline translation
+    try:
+        f = open(path, "rb", buffering=0)
+    except OSError:
+        return None
+    try:
+        decoder = codecs.getincrementaldecoder("utf-8")("strict")
+        size = breaks = 0
+        for block in read_blocks(f):
+            check_cancel(cancel)
+            if not size and looks_binary(bytes(block[:SNIFF_BYTES])):
+                f.close()
+                return None
+            text = decoder.decode(block)
+            if "\r" in text:
+                f.close()
+                return None
+            breaks += line_breaks(text)
+            size += len(block)
+        decoder.decode(b"", final=True)
+    except BaseException as e:
+        f.close()
+        if isinstance(e, (UnicodeDecodeError, OSError)):
+            return None
+        raise
+    return StreamedText(f, size, breaks)
+
+
+def read_sample(path: Path, size: int, encoding: str = "utf-8") -> str:
+    # Text of a few blocks of a big file, for stats that do not need all of
+    # it; blocks are joined by a line break. Other encodings than UTF-8 are
+    # sampled at the head only: a block cut from the middle of a file may
+    # not decode without the BOM.
+    step = max(size - SAMPLE_BLOCK, 0) // (SAMPLE_BLOCKS - 1) & ~3
+    offsets = range(0, size, step or size or 1) if encoding == "utf-8" else (0,)
+    parts: list[str] = []
     try:
         with open(path, "rb") as f:
-            chunk = f.read(2048)
-        return b"\0" not in chunk
-    except Exception:
-        return False
+            for offset in islice(offsets, SAMPLE_BLOCKS):
+                f.seek(offset)
+                parts.append(decode_text(f.read(SAMPLE_BLOCK), encoding))
+    except OSError:
+        pass
+    return "\n".join(parts)
 
 
-def read_text_safe(path: Path) -> str:
+def read_text_safe(path: Path, encoding: str = "utf-8") -> str:
     try:
-        return Path(path).read_text(encoding="utf-8", errors="ignore")
+        return Path(path).read_text(encoding=encoding, errors="ignore")
     except Exception:
         return ""
+
+
+def read_ahead(
+    items: Iterable[T],
+    read: Callable[[T], R],
+    workers: int,
+    cancel: CancelToken | None = None,
+) -> Iterator[tuple[T, R]]:
+    # Ordered map with bounded read-ahead: up to 4 * workers reads are in
+    # flight on a thread pool while results are yielded in input order.
+    # Cancellation is checked before every item.
+    it = iter(items)
+    if workers <= 1:
+        for item in it:
+            check_cancel(cancel)
+            yield item, read(item)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cp-read")
+    try:
+        pending = deque((x, pool.submit(read, x)) for x in islice(it, workers * 4))
+        while pending:
+            check_cancel(cancel)
+            item, fut = pending.popleft()
+            for nxt in islice(it, 1):
+                pending.append((nxt, pool.submit(read, nxt)))
+            yield item, fut.result()
+    finally:
+        # Also runs when the consumer stops early (break, cancel, close)
+        pool.shutdown(wait=False, cancel_futures=True)
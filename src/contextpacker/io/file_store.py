@@ -0,0 +1,199 @@
+from __future__ import annotations
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Mapping
+
+from ..core.model import Node
+from ..policy.generated import detect_generated
+from .classify import binary_by_name, sniff_encoding
+from .file_read import (
+    SNIFF_BYTES,
+    STREAM_THRESHOLD,
+    decode_text,
+    read_blocks,
+    read_sample,
+    read_text_safe,
+)
+
+# (absolute path, size_bytes, mtime_ns) as recorded in the snapshot
+FileKey = tuple[str, int, int]
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    is_text: bool
+    text: str | None  # decoded content; None = not kept, read again lazily
+    digest: str | None = None  # content hash of the whole file, if read whole
+    encoding: str = "utf-8"  # of text files (see classify)
+
+
+def _key(node: Node) -> FileKey:
+    return (str(node.path), node.size_bytes, node.mtime_ns)
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_digest(path: Path) -> str | None:
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb", buffering=0) as f:
+            for block in read_blocks(f):
+                h.update(block)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+class FileStore:
+    # Single-read ingest: each file is opened once, classified from the same
+    # read, and its decoded text kept for the later stages (preview snippet,
+    # transcript) while the byte budget allows.
+    def __init__(self, max_file_bytes: int, max_cached_bytes: int) -> None:
+        self.max_file_bytes = max_file_bytes
+        self.max_cached_bytes = max_cached_bytes
+        self._entries: dict[FileKey, FileEntry] = {}
+        self._tokens: dict[FileKey, dict[str, int]] = {}  # tokenizer -> count
+        self._generated: dict[FileKey, str] = {}  # reason; "" = not generated
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def entry(self, node: Node) -> FileEntry:
+        key = _key(node)
+        hit = self._entries.get(key)
+        if hit is not None:
+            return hit
+
+        # Known binary formats are not read at all; files over max_file_bytes
+        # never reach the transcript: sniff only
+        if binary_by_name(node.path.name):
+            e = FileEntry(False, None)
+            with self._lock:
+                self._entries[key] = e
+            return e
+        whole = node.size_bytes <= self.max_file_bytes
+        if whole and node.size_bytes >= STREAM_THRESHOLD:
+            e = self._entry_streamed(node)
+            if e is not None:
+                with self._lock:
+                    self._entries[key] = e
+                return e
+        try:
+            with open(node.path, "rb") as f:
+                data = f.read() if whole else f.read(SNIFF_BYTES)
+        except OSError:
+            e = FileEntry(False, None)
+        else:
+            digest = content_digest(data) if whole else None
+            encoding = sniff_encoding(data[:SNIFF_BYTES])
+            if encoding is None:
+                e = FileEntry(False, None, digest)
+            elif whole and self._reserve(len(data)):
+                e = FileEntry(True, decode_text(data, encoding), digest, encoding)
+            else:
+                e = FileEntry(True, None, digest, encoding)
+
+        with self._lock:
+            self._entries[key] = e
+        return e
+
+    def _entry_streamed(self, node: Node) -> FileEntry | None:
+        # Big files are sniffed and hashed block by block, without a bytes
+        # or str copy; their text is not kept (the transcript streams them)
+        h = hashlib.blake2b(digest_size=16)
+        encoding = sniff_encoding(b"")
+        try:
+            with open(node.path, "rb", buffering=0) as f:
+                for i, block in enumerate(read_blocks(f)):
+                    if not i:
+                        encoding = sniff_encoding(bytes(block[:SNIFF_BYTES]))
+                        if encoding is None:
+                            return FileEntry(False, None)
+                    h.update(block)
+        except OSError:
+            return None
+        return FileEntry(True, None, h.hexdigest(), encoding or "utf-8")
+
+    def seed(
+        self,
+        node: Node,
+        digest: str,
+        tokens: dict[str, int] | None = None,
+        encoding: str = "utf-8",
+        generated: str | None = None,
+    ) -> None:
+        # Known-unchanged text file (e.g. from the previous manifest): it is
+        # classified without a read, its content read only if rendered.
+        # Binary names win over any record, as in entry().
+        if binary_by_name(node.path.name):
+            return
+        key = _key(node)
+        with self._lock:
+            self._entries.setdefault(key, FileEntry(True, None, digest, encoding))
+            if tokens:
+                self._tokens.setdefault(key, {}).update(tokens)
+            if generated is not None:
+                self._generated.setdefault(key, generated)
+
+    def tokens(self, node: Node, tokenizer: str) -> int | None:
+        return self._tokens.get(_key(node), {}).get(tokenizer)
+
+    def set_tokens(self, node: Node, tokenizer: str, n: int) -> None:
+        with self._lock:
+            self._tokens.setdefault(_key(node), {})[tokenizer] = n
+
+    def token_counts(self, node: Node) -> dict[str, int]:
+        return dict(self._tokens.get(_key(node), {}))
+
+    def generated(self, node: Node) -> str:
+        # Why a text file looks generated, "" if it does not; scanned once
+        # per (size, mtime). Big files whose text is not kept are scanned
+        # from a sample, not decoded whole.
+        key = _key(node)
+        hit = self._generated.get(key)
+        if hit is None:
+            e = self.entry(node)
+            if e.text is None and node.size_bytes >= STREAM_THRESHOLD:
+                text = read_sample(node.path, node.size_bytes, e.encoding)
+            else:
+                text = self.read_text(node)
+            hit = detect_generated(node.rel_path, text)
+            with self._lock:
+                self._generated[key] = hit
+        return hit
+
+    def generated_known(self, node: Node) -> str | None:
+        # Cached result only (None = never scanned), for the manifest
+        return self._generated.get(_key(node))
+
+    def _reserve(self, n: int) -> bool:
+        with self._lock:
+            if self._cached_bytes + n > self.max_cached_bytes:
+                return False
+            self._cached_bytes += n
+            return True
+
+    def is_text(self, node: Node) -> bool:
+        return self.entry(node).is_text
+
+    def encoding(self, node: Node) -> str:
+        return self.entry(node).encoding
+
+    def read_text(self, node: Node) -> str:
+        e = self.entry(node)
+        return e.text if e.text is not None else read_text_safe(node.path, e.encoding)
+
+    def digest(self, node: Node) -> str | None:
+        e = self.entry(node)
+        return e.digest if e.digest is not None else file_digest(node.path)
+
+    def reader(self, nodes: Mapping[Path, Node]) -> Callable[[Path], str]:
+        # path -> text for the render stage
+        def read(p: Path) -> str:
+            node = nodes.get(p)
+            return self.read_text(node) if node is not None else read_text_safe(p)
+
+        return read
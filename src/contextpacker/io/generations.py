@@ -0,0 +1,84 @@
+from __future__ import annotations
+import os
+import shutil
+from pathlib import Path
+
+from ..core.config import Durability, OutputSpec
+from .out_paths import OutputPaths, current_generation, generation_paths
+from .write_atomic import sync_dir, write_text_atomic
+
+# A run writes its artifacts into a fresh generations/<id>/ directory, then
+# replaces the CURRENT pointer: a reader that resolves the pointer once sees
+# one complete set, never a mix of two runs. Published directories are not
+# written again; the newest KEEP_GENERATIONS stay so readers of the previous
+# one are not cut off.
+
+KEEP_GENERATIONS = 3
+
+
+def new_generation(project_root: Path, outputs: OutputSpec) -> OutputPaths:
+    # An empty directory for the next generation. Ids only grow, so one left
+    # by a run that stopped before publishing is not reused; a run that
+    # takes the same id first (watch and the GUI at once) moves this one on.
+    out_dir = Path(project_root).resolve() / outputs.out_dir_name
+    gen = max(
+        current_generation(out_dir / outputs.pointer_name),
+        *_existing(out_dir / outputs.generations_dir_name),
+        0,
+    )
+    while True:
+        gen += 1
+        paths = generation_paths(project_root, outputs, gen)
+        try:
+            paths.transcript_path.parent.mkdir(parents=True)
+        except FileExistsError:
+            continue
+        return paths
+
+
+def publish_generation(paths: OutputPaths, durability: Durability = "none") -> None:
+    # The commit point: everything in the directory is written (and synced,
+    # per durability) before CURRENT names it. With "full" that includes
+    # the directory's own entry, and generations/ in the out dir (new on
+    # the first run), so the pointer never names an entry lost in a crash.
+    if durability == "full":
+        gen_dir = paths.transcript_path.parent
+        sync_dir(gen_dir)
+        sync_dir(gen_dir.parent)
+        sync_dir(paths.out_dir)
+    write_text_atomic(paths.pointer_path, f"{paths.generation}\n", durability)
+
+
+def discard_generation(paths: OutputPaths) -> None:
+    shutil.rmtree(paths.transcript_path.parent, ignore_errors=True)
+
+
+def prune_generations(
+    paths: OutputPaths, outputs: OutputSpec, keep: int = KEEP_GENERATIONS
+) -> None:
+    # Generations older than the newest `keep`, and the flat layout's
+    # artifacts, once paths' generation is current. A directory still in use
+    # (open files on Windows) is left for the next run.
+    gens = paths.out_dir / outputs.generations_dir_name
+    for gen in _existing(gens):
+        if gen <= paths.generation - keep:
+            shutil.rmtree(gens / str(gen), ignore_errors=True)
+    flat = (
+        outputs.transcript_name,
+        outputs.changes_name,
+        outputs.manifest_name,
+        outputs.section_index_name,
+    )
+    for name in flat:
+        try:
+            os.remove(paths.out_dir / name)
+        except OSError:
+            pass
+
+
+def _existing(gens: Path) -> list[int]:
+    try:
+        names = os.listdir(gens)
+    except OSError:
+        return []
+    return [int(n) for n in names if n.isdigit()]
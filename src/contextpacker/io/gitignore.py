@@ -1,32 +1,174 @@
 from __future__ import annotations
+from dataclasses import dataclass
 from pathlib import Path
+import re
+
+
+@dataclass(frozen=True)
+class GitignoreRule:
+    base: str  # rel prefix of the directory the rule came from ("" or "a/b/")
+    pattern: str
+    regex: re.Pattern[str]
+    negate: bool
+    dir_only: bool
+    anchored: bool  # matched against the path below `base`, else the basename
 
 
 def load_gitignore_rules(gitignore_path: Path) -> list[str]:
-    # Conservative/partial: supports:
-    #   - plain names
-    #   - suffix wildcards like "*.log"
-    # Ignores complex patterns, negations, and directory globs for now.
+    # Raw patterns (comments and blank lines dropped), in file order
     p = Path(gitignore_path)
-    if not p.exists():
+    try:
+        text = p.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
         return []
     out: list[str] = []
-    try:
-        for line in p.read_text(encoding="utf-8", errors="ignore").splitlines():
-            s = line.strip()
-            if not s or s.startswith("#"):
-                continue
-            # skip advanced patterns for now
-            if s.startswith("!"):
+    for line in text.splitlines():
+        s = _strip_trailing_spaces(line)
+        if not s or s.startswith("#"):
+            continue
+        out.append(s)
+    return out
+
+
+def parse_gitignore(lines: list[str], base: str = "") -> list[GitignoreRule]:
+    rules: list[GitignoreRule] = []
+    for raw in lines:
+        s = raw
+        negate = s.startswith("!")
+        if negate:
+            s = s[1:]
+        elif s.startswith("\\!") or s.startswith("\\#"):
+            s = s[1:]
+        dir_only = s.endswith("/")
+        s = s.rstrip("/")
+        if not s:
+            continue
+        # A slash at the start or in the middle anchors the pattern to the
+        # directory of the .gitignore; otherwise it matches at any depth.
+        anchored = "/" in s
+        s = s.lstrip("/")
+        try:
+            regex = re.compile(_translate(s) + r"\Z", re.DOTALL)
+        except re.error:
+            continue
+        rules.append(GitignoreRule(base, raw, regex, negate, dir_only, anchored))
+    return rules
+
+
+class GitignoreMatcher:
+    # Nested .gitignore files plus .git/info/exclude, with git's precedence:
+    # deeper files override shallower ones, the last matching line wins, and
+    # nothing below an excluded directory can be re-included. Each
+    # directory's rule chain is compiled once, on first use, and inherited
+    # by its subdirectories.
+    def __init__(self, project_root: Path) -> None:
+        self.root = Path(project_root)
+        self._chains: dict[str, tuple[GitignoreRule, ...]] = {}
+        self._dir_excluded: dict[str, bool] = {"": False}
+        self.sources: dict[str, int] = {}  # rel file -> rule count
+
+        base = list(self._load(".git/info/exclude", ""))
+        self._chains[""] = (*base, *self._load(".gitignore", ""))
+
+    def _load(self, rel_file: str, base: str) -> list[GitignoreRule]:
+        rules = parse_gitignore(load_gitignore_rules(self.root / rel_file), base)
+        if rules:
+            self.sources[rel_file] = len(rules)
+        return rules
+
+    def _chain(self, dir_prefix: str) -> tuple[GitignoreRule, ...]:
+        hit = self._chains.get(dir_prefix)
+        if hit is not None:
+            return hit
+        parent = dir_prefix[: dir_prefix.rstrip("/").rfind("/") + 1]
+        chain = (
+            *self._chain(parent),
+            *self._load(dir_prefix + ".gitignore", dir_prefix),
+        )
+        self._chains[dir_prefix] = chain
+        return chain
+
+    def _is_dir_excluded(self, dir_prefix: str) -> bool:
+        hit = self._dir_excluded.get(dir_prefix)
+        if hit is not None:
+            return hit
+        rel = dir_prefix.rstrip("/")
+        parent = dir_prefix[: rel.rfind("/") + 1]
+        result = self._is_dir_excluded(parent) or self._match(parent, rel, True)
+        self._dir_excluded[dir_prefix] = result
+        return result
+
+    def _match(self, dir_prefix: str, rel: str, is_dir: bool) -> bool:
+        name = rel[len(dir_prefix) :]
+        for rule in reversed(self._chain(dir_prefix)):
+            if rule.dir_only and not is_dir:
                 continue
+            subject = rel[len(rule.base) :] if rule.anchored else name
+            if rule.regex.match(subject):
+                return not rule.negate
+        return False
+
+    def is_ignored(self, rel: str, is_dir: bool) -> bool:
+        # rel: "/"-separated path below the project root, no trailing slash
+        dir_prefix = rel[: rel.rfind("/") + 1]
+        if self._is_dir_excluded(dir_prefix):
+            return True
+        return self._match(dir_prefix, rel, is_dir)
+
 
-            # Handle trailing slash for directories: "foo/" -> "foo"
-            if s.endswith("/"):
-                s = s[:-1]
+def _strip_trailing_spaces(line: str) -> str:
+    s = line.rstrip("\r\n")
+    while s.endswith(" ") and not s.endswith("\\ "):
+        s = s[:-1]
+    return s
 
-            if "/" in s:
+
+def _translate(pat: str) -> str:
+    # gitignore glob -> regex: "*" and "?" never cross "/", "**" spans
+    # directories when it is a whole path component.
+    out: list[str] = []
+    i, n = 0, len(pat)
+    while i < n:
+        c = pat[i]
+        if c == "*":
+            j = i
+            while j < n and pat[j] == "*":
+                j += 1
+            whole = (i == 0 or pat[i - 1] == "/") and (j == n or pat[j] == "/")
+            if j - i >= 2 and whole:
+                if j == n:
+                    out.append(".*")
+                    i = j
+                else:
+                    out.append("(?:.*/)?")  # "**/" = zero or more directories
+                    i = j + 1
                 continue
-            out.append(s)
-    except Exception:
-        return []
-    return out
+            out.append("[^/]*")
+            i = j
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and pat[j] in "!^":
+                j += 1
+            if j < n and pat[j] == "]":
+                j += 1
+            while j < n and pat[j] != "]":
+                j += 1
+            if j >= n:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pat[i + 1 : j]
+            if body[:1] in ("!", "^"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pat[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
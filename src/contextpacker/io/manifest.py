@@ -1,23 +1,43 @@
 from __future__ import annotations
 import json
 import datetime
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-from ..core.config import Config
-from ..core.model import Snapshot, FilteredSnapshot
+from ..core.config import Config, Durability, OutputSpec
+from ..core.model import FilteredSnapshot, Node
+from ..core.compact_model import AnySnapshot
 from ..policy.ignore_spec import compile_ignore, ALWAYS_IGNORE
-from ..io.out_paths import OutputPaths
+from ..io.out_paths import OutputPaths, get_output_paths
+from ..io.gitignore import load_gitignore_rules
 from ..io.write_atomic import write_text_atomic
+from ..io.dir_cache import RACY_WINDOW_NS
+from ..io.file_store import FileStore, file_digest
+from ..io.classify import CLASSIFIER_VERSION
+from ..policy.generated import DETECTOR_VERSION
 from .. import __version__
 
 
+@dataclass(frozen=True)
+class ManifestEntry:
+    path: str  # "/"-separated, relative to the project root
+    size_bytes: int
+    mtime_ns: int
+    blake2b: str  # 16-byte hex digest of the raw file content
+    tokens: dict[str, int] | None = None  # tokenizer -> count of its section
+    encoding: str = "utf-8"
+    generated: str | None = None  # policy/generated.py reason; None = not scanned
+
+
 def build_manifest(
     config: Config,
-    snapshot: Snapshot,
+    snapshot: AnySnapshot,
     filtered: FilteredSnapshot,
     out_paths: OutputPaths,
     files_included: list[Path] | None = None,
+    file_store: FileStore | None = None,
+    deduplicated: int = 0,
 ) -> dict[str, Any]:
     cfg = config.normalized()
     ignore_spec = compile_ignore(cfg.project_root, cfg.preset)
@@ -25,18 +45,42 @@ def build_manifest(
     files = files_included if files_included is not None else filtered.files_to_read
 
     total_bytes = 0
+    entries: list[dict[str, Any]] = []
     for p in files:
         node = snapshot.nodes.get(p)
         if node:
             total_bytes += node.size_bytes
+            e = _file_entry(node, file_store)
+            if e is not None:
+                entries.append(e)
+
+    # Files left out by the token budget keep their entries (and counts), so
+    # the next run does not count them again
+    dropped: list[dict[str, Any]] = []
+    for p in filtered.dropped_by_budget:
+        node = snapshot.nodes.get(p)
+        e = _file_entry(node, file_store) if node else None
+        if e is not None:
+            dropped.append(e)
+
+    # Likewise generated files left out, with their reasons
+    generated: list[dict[str, Any]] = []
+    for p in filtered.dropped_as_generated:
+        node = snapshot.nodes.get(p)
+        e = _file_entry(node, file_store) if node else None
+        if e is not None:
+            generated.append(e)
 
-    # expand rules
+    # expand rules: built-ins, preset, then the root .gitignore verbatim
     all_rules = list(sorted(ALWAYS_IGNORE)) + list(ignore_spec.rules)
+    all_rules += load_gitignore_rules(cfg.project_root / ".gitignore")
 
     return {
         "tool": {"name": "ContextPacker", "version": __version__},
         "run_utc": datetime.datetime.now(datetime.timezone.utc).isoformat(),
         "project_root": str(cfg.project_root.name),
+        # Versions of the checks behind each entry's encoding and "generated"
+        "classifiers": {"text": CLASSIFIER_VERSION, "generated": DETECTOR_VERSION},
         "config": {
             "preset": cfg.preset,
             "selected_top_level": list(cfg.selected_top_level),
@@ -44,21 +88,153 @@ def build_manifest(
             "limits": {
                 "max_file_bytes": cfg.max_file_bytes,
                 "max_total_bytes": cfg.max_total_bytes,
+                "token_budget": cfg.token_budget,
+            },
+            "budget_strategy": cfg.budget_strategy,
+            "tokenizer": cfg.tokenizer,
+            "priorities": [list(p) for p in cfg.priorities],
+            "compression": {
+                "strip_comments": cfg.strip_comments,
+                "collapse_blank_lines": cfg.collapse_blank_lines,
+                "minify_json": cfg.minify_json,
+                "elide_bodies": cfg.elide_bodies,
+            },
+            "dedup": {
+                "mode": cfg.dedup,
+                "near_dup_similarity": cfg.near_dup_similarity,
+                "min_bytes": cfg.dedup_min_bytes,
             },
+            "generated_files": cfg.generated_files,
         },
         "stats": {
             "visible_nodes": len(filtered.visible_nodes),
             "files_included": len(files),
             "total_bytes": total_bytes,
+            "tokens_included": filtered.total_tokens,
+            "dropped_by_budget": len(dropped),
+            "deduplicated": deduplicated,
+            "generated": len(filtered.generated) + len(generated),
         },
         "outputs": {
-            "transcript": str(out_paths.transcript_path.relative_to(out_paths.out_dir)),
-            "changes": str(out_paths.changes_path.relative_to(out_paths.out_dir)),
+            "transcript": out_paths.transcript_path.name,
+            "changes": out_paths.changes_path.name,
         },
         "ignore_rules": all_rules,
+        "files": entries,
+        "dropped_files": dropped,
+        "excluded_generated": generated,
     }
 
 
-def write_manifest_atomic(path: Path, manifest: dict[str, Any]) -> None:
+def _file_entry(node: Node, file_store: FileStore | None) -> dict[str, Any] | None:
+    digest = file_store.digest(node) if file_store else file_digest(node.path)
+    if digest is None:
+        return None
+    e: dict[str, Any] = {
+        "path": node.rel_path.as_posix(),
+        "size": node.size_bytes,
+        "mtime_ns": node.mtime_ns,
+        "blake2b": digest,
+    }
+    tokens = file_store.token_counts(node) if file_store else None
+    if tokens:
+        e["tokens"] = tokens
+    encoding = file_store.encoding(node) if file_store else "utf-8"
+    if encoding != "utf-8":
+        e["encoding"] = encoding
+    # Scan results are kept either way ("" = not generated), so unchanged
+    # files are not scanned again
+    generated = file_store.generated_known(node) if file_store else None
+    if generated is not None:
+        e["generated"] = generated
+    return e
+
+
+def load_manifest_entries(path: Path) -> dict[str, ManifestEntry]:
+    # Per-file entries of a previous manifest, keyed by rel path. Entries
+    # whose mtime is too close to the run that wrote them are dropped: the
+    # file may have changed again without its mtime moving. Results of
+    # other classifier versions are not kept: the file is checked again.
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        run_ns = int(
+            datetime.datetime.fromisoformat(data["run_utc"]).timestamp() * 1e9
+        )
+        versions = data.get("classifiers", {})
+        if versions.get("text") != CLASSIFIER_VERSION:
+            return {}
+        scanned = versions.get("generated") == DETECTOR_VERSION
+        out: dict[str, ManifestEntry] = {}
+        listed = ("files", "dropped_files", "excluded_generated")
+        for e in [e for name in listed for e in data.get(name, [])]:
+            tokens = {str(k): int(v) for k, v in e.get("tokens", {}).items()}
+            generated = e.get("generated") if scanned else None
+            entry = ManifestEntry(
+                str(e["path"]),
+                int(e["size"]),
+                int(e["mtime_ns"]),
+                str(e["blake2b"]),
+                tokens or None,
+                str(e.get("encoding", "utf-8")),
+                None if generated is None else str(generated),
+            )
+            if entry.mtime_ns < run_ns - RACY_WINDOW_NS:
+                out[entry.path] = entry
+    except Exception:
+        # Missing, corrupt or older manifest: nothing is known
+        return {}
+    return out
+
+
+def unchanged_nodes(
+    previous: dict[str, ManifestEntry], snapshot: AnySnapshot
+) -> list[tuple[Node, ManifestEntry]]:
+    # Files of the snapshot whose size and mtime still match their previous
+    # entry: their content (and hash) is known without reading them.
+    out: list[tuple[Node, ManifestEntry]] = []
+    for rel, e in previous.items():
+        node = snapshot.nodes.get(snapshot.root / rel)
+        if (
+            node is not None
+            and not node.is_dir
+            and node.size_bytes == e.size_bytes
+            and node.mtime_ns == e.mtime_ns
+        ):
+            out.append((node, e))
+    return out
+
+
+def write_manifest_atomic(
+    path: Path, manifest: dict[str, Any], durability: Durability = "none"
+) -> None:
     text = json.dumps(manifest, indent=2, sort_keys=True)
-    write_text_atomic(path, text)
+    write_text_atomic(path, text, durability)
+
+
+@dataclass(frozen=True)
+class Generation:
+    id: int
+    manifest: dict[str, Any]
+    paths: OutputPaths  # where this generation's artifacts are
+
+
+def load_generation(
+    project_root: Path, outputs: OutputSpec, verify: bool = True
+) -> Generation | None:
+    # The current generation, resolved once: open its artifacts through
+    # .paths, not by their names in the out dir. Published directories are
+    # not rewritten; the check (sizes, with verify also hashes) catches a
+    # damaged or hand-edited set. None if there is none.
+    paths = get_output_paths(project_root, outputs)
+    try:
+        manifest = json.loads(paths.manifest_path.read_text(encoding="utf-8"))
+        gen = manifest["generation"]
+        for name, a in gen["artifacts"].items():
+            p = paths.manifest_path.parent / name
+            if p.stat().st_size != int(a["size"]):
+                return None
+            if verify and file_digest(p) != a["blake2b"]:
+                return None
+        return Generation(int(gen["id"]), manifest, paths)
+    except Exception:
+        return None
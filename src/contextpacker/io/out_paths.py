@@ -9,13 +9,43 @@ class OutputPaths:
     out_dir: Path
     transcript_path: Path
     changes_path: Path
+    snapshot_cache_path: Path
+    manifest_path: Path
+    section_index_path: Path
+    pointer_path: Path
+    generation: int = 0  # 0 = none published (or the flat pre-generation layout)
 
 
 def get_output_paths(project_root: Path, outputs: OutputSpec) -> OutputPaths:
+    # Artifacts of the current (last complete) generation
+    out_dir = Path(project_root).resolve() / outputs.out_dir_name
+    gen = current_generation(out_dir / outputs.pointer_name)
+    return generation_paths(project_root, outputs, gen)
+
+
+def generation_paths(
+    project_root: Path, outputs: OutputSpec, generation: int
+) -> OutputPaths:
     root = Path(project_root).resolve()
     out_dir = root / outputs.out_dir_name
+    # Generation 0 reads the flat layout older versions wrote
+    gen_dir = out_dir
+    if generation:
+        gen_dir = out_dir / outputs.generations_dir_name / str(generation)
     return OutputPaths(
         out_dir=out_dir,
-        transcript_path=out_dir / outputs.transcript_name,
-        changes_path=out_dir / outputs.changes_name,
+        transcript_path=gen_dir / outputs.transcript_name,
+        changes_path=gen_dir / outputs.changes_name,
+        snapshot_cache_path=out_dir / outputs.snapshot_cache_name,
+        manifest_path=gen_dir / outputs.manifest_name,
+        section_index_path=gen_dir / outputs.section_index_name,
+        pointer_path=out_dir / outputs.pointer_name,
+        generation=generation,
     )
+
+
+def current_generation(pointer_path: Path) -> int:
+    try:
+        return int(Path(pointer_path).read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        return 0
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import NamedTuple
+
+from .write_atomic import write_text_atomic
+
+INDEX_VERSION = 1
+
+
+class SectionEntry(NamedTuple):
+    path: str  # "/"-separated rel path of the file
+    blake2b: str  # content hash of the file the section was rendered from
+    offset: int  # byte range of the "File:" section in the transcript
+    length: int
+    lines: int  # line count of the section (str.splitlines)
+
+
+@dataclass(frozen=True)
+class SectionIndex:
+    # Where each file's rendered section sits in the transcript on disk.
+    # Only valid for the exact transcript it was written with.
+    header_length: int
+    header_lines: int
+    sections: dict[str, SectionEntry]  # in transcript order
+    render_key: str = ""  # content transform the sections were rendered with
+
+
+def _transcript_stamp(path: Path) -> list[int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_section_index(
+    index_path: Path, transcript_path: Path, render_key: str = ""
+) -> SectionIndex | None:
+    try:
+        data = json.loads(Path(index_path).read_text(encoding="utf-8"))
+        if data.get("version") != INDEX_VERSION:
+            return None
+        # The transcript was replaced or edited since: offsets are meaningless
+        if data["transcript"] != _transcript_stamp(transcript_path):
+            return None
+        # Sections rendered with other compression settings cannot be reused
+        if data.get("render_key", "") != render_key:
+            return None
+        sections = {
+            str(p): SectionEntry(str(p), str(h), int(o), int(n), int(k))
+            for p, h, o, n, k in data["sections"]
+        }
+        return SectionIndex(
+            int(data["header_length"]), int(data["header_lines"]), sections, render_key
+        )
+    except Exception:
+        # Missing or corrupt index: full rebuild
+        return None
+
+
+def save_section_index(
+    index_path: Path,
+    transcript_path: Path,
+    header_length: int,
+    header_lines: int,
+    sections: list[SectionEntry],
+    render_key: str = "",
+) -> None:
+    # Written after the transcript is in place, stamped with its size/mtime
+    stamp = _transcript_stamp(transcript_path)
+    if stamp is None:
+        return
+    text = json.dumps(
+        {
+            "version": INDEX_VERSION,
+            "transcript": stamp,
+            "header_length": header_length,
+            "header_lines": header_lines,
+            "sections": [list(e) for e in sections],
+            "render_key": render_key,
+        },
+        separators=(",", ":"),
+    )
+    write_text_atomic(index_path, text)
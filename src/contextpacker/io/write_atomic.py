@@ -1,22 +1,94 @@
 from __future__ import annotations
 from pathlib import Path
+from typing import Iterable, Iterator
 import os
 import tempfile
 
+from ..core.config import Durability
 
-def write_text_atomic(path: Path, text: str) -> None:
+WRITE_BUFFER = 1 << 20
+
+
+def encode_text(text: str) -> bytes:
+    # Same bytes a text-mode write (utf-8, errors="ignore") would produce
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8", errors="ignore")
+
+
+def hashed_chunks(chunks: Iterable[bytes], h) -> Iterator[bytes]:
+    # Feeds every chunk to hashlib object h on its way to the file
+    for chunk in chunks:
+        h.update(chunk)
+        yield chunk
+
+
+def stage_chunks(
+    path: Path, chunks: Iterable[bytes], durability: Durability = "none"
+) -> Path:
+    # Stream chunks into a temp file next to `path` (same filesystem, so the
+    # later os.replace is atomic). The caller commits or discards it.
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
 
-    # atomic replace within same filesystem
     fd, tmp = tempfile.mkstemp(prefix=p.name + ".", dir=str(p.parent))
     try:
-        with os.fdopen(fd, "w", encoding="utf-8", errors="ignore") as f:
-            f.write(text)
-        os.replace(tmp, p)
+        with os.fdopen(fd, "wb", buffering=WRITE_BUFFER) as f:
+            for chunk in chunks:
+                f.write(chunk)
+            if durability != "none":
+                # Data on disk before the rename can make it visible: a crash
+                # never leaves an empty or partial file under the final name
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        discard_staged(Path(tmp))
+        raise
+    return Path(tmp)
+
+
+def stage_text_chunks(
+    path: Path, chunks: Iterable[str], durability: Durability = "none"
+) -> Path:
+    return stage_chunks(path, (encode_text(c) for c in chunks), durability)
+
+
+def commit_staged(tmp: Path, path: Path, durability: Durability = "none") -> None:
+    try:
+        os.replace(tmp, path)
     finally:
-        try:
-            if os.path.exists(tmp):
-                os.remove(tmp)
-        except Exception:
-            pass
+        discard_staged(tmp)
+    if durability == "full":
+        sync_dir(Path(path).parent)
+
+
+def sync_dir(path: Path) -> None:
+    # Makes renames in the directory durable. POSIX only; elsewhere the
+    # rename is as durable as the filesystem makes it.
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def discard_staged(tmp: Path) -> None:
+    try:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    except Exception:
+        pass
+
+
+def write_bytes_atomic(
+    path: Path, data: bytes | Iterable[bytes], durability: Durability = "none"
+) -> None:
+    # atomic replace within same filesystem
+    chunks = (data,) if isinstance(data, bytes) else data
+    commit_staged(stage_chunks(path, chunks, durability), Path(path), durability)
+
+
+def write_text_atomic(path: Path, text: str, durability: Durability = "none") -> None:
+    write_bytes_atomic(path, encode_text(text), durability)
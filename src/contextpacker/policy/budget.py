@@ -0,0 +1,247 @@
+from __future__ import annotations
+import itertools
+import math
+import operator
+import string
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Iterable, Mapping, Sequence
+
+from ..core.cancel import CancelToken, check_cancel
+from ..core.config import BudgetStrategy, Config
+from ..core.errors import ContextPackerError
+from ..core.model import Node
+from ..io.file_read import read_ahead
+from ..io.file_store import FileStore
+from ..render.compress import compression_key
+from .generated import generated_key, packed_text
+from ..render.transcript_render import render_section
+
+# Batch API: a list of file contents in, one token count per content out,
+# so an exact tokenizer can encode many files per call
+TokenCounter = Callable[[Sequence[str]], list[int]]
+
+COUNT_BATCH = 256  # contents per TokenCounter call
+
+# Knapsack table size limit (items x capacity buckets); token weights are
+# bucketed (rounded up, so a solution always fits) to stay under it
+KNAPSACK_CELLS = 4_000_000
+
+_PUNCT = string.punctuation.encode("ascii")
+_SPACE = b" \t\r\n\f\v"
+
+
+def approx_tokens(data: bytes) -> int:
+    # BPE-like estimate from byte classes, counted in C (translate/count):
+    # ~1 token per punctuation byte, ~4 bytes per token for word characters,
+    # one per line for newline + indentation. Errs high on prose.
+    n = len(data)
+    punct = n - len(data.translate(None, _PUNCT))
+    space = n - len(data.translate(None, _SPACE))
+    return punct + (n - punct - space + 3) // 4 + data.count(b"\n")
+
+
+def count_approx(texts: Sequence[str]) -> list[int]:
+    return [approx_tokens(t.encode("utf-8", "ignore")) for t in texts]
+
+
+TOKENIZERS: dict[str, TokenCounter] = {"approx": count_approx}
+
+
+def register_tokenizer(name: str, counter: TokenCounter) -> None:
+    TOKENIZERS[name] = counter
+
+
+def get_tokenizer(name: str) -> TokenCounter:
+    hit = TOKENIZERS.get(name)
+    if hit is not None:
+        return hit
+    if name.startswith("tiktoken:"):
+        counter = _tiktoken_counter(name.split(":", 1)[1])
+        TOKENIZERS[name] = counter
+        return counter
+    raise ContextPackerError(f"Unknown tokenizer: {name}")
+
+
+def _tiktoken_counter(encoding: str) -> TokenCounter:
+    # Optional exact counts; tiktoken is not a dependency of the package
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ContextPackerError(
+            f"Tokenizer 'tiktoken:{encoding}' needs the tiktoken package."
+        ) from e
+    enc = tiktoken.get_encoding(encoding)
+
+    def count(texts: Sequence[str]) -> list[int]:
+        encoded = enc.encode_batch(list(texts), disallowed_special=())
+        return [len(t) for t in encoded]
+
+    return count
+
+
+def count_tokens(
+    nodes: list[Node],
+    files: FileStore,
+    config: Config,
+    cancel: CancelToken | None = None,
+    generated: Mapping[Path, str] | None = None,
+) -> list[int]:
+    # Tokens of each file's rendered (and compressed, or summarized if
+    # generated) transcript section. Counts are cached in the FileStore (and
+    # carried over runs by the manifest); the rest are read ahead and
+    # counted COUNT_BATCH files per tokenizer call.
+    counter = get_tokenizer(config.tokenizer)
+    rendered = compression_key(config) + generated_key(config)
+    key = f"{config.tokenizer}+{rendered}" if rendered else config.tokenizer
+    reasons = generated or {}
+    counts = [files.tokens(n, key) for n in nodes]
+    missing = [i for i, c in enumerate(counts) if c is None]
+    workers = config.read_workers
+
+    def section(node: Node) -> str:
+        text = packed_text(
+            node.rel_path,
+            files.read_text(node),
+            config,
+            reasons.get(node.path, ""),
+            cancel,
+        )
+        return render_section(node.rel_path, text)
+
+    for start in range(0, len(missing), COUNT_BATCH):
+        batch = missing[start : start + COUNT_BATCH]
+        todo = [nodes[i] for i in batch]
+        texts = [t for _, t in read_ahead(todo, section, workers, cancel)]
+        for i, n in zip(batch, counter(texts)):
+            files.set_tokens(nodes[i], key, n)
+            counts[i] = n
+    return [c or 0 for c in counts]
+
+
+def count_total(
+    texts: Iterable[str], config: Config, cancel: CancelToken | None = None
+) -> int:
+    # Tokens of a stream of texts (the transcript header's pieces), counted
+    # COUNT_BATCH texts per tokenizer call
+    counter = get_tokenizer(config.tokenizer)
+    it = iter(texts)
+    total = 0
+    while batch := list(itertools.islice(it, COUNT_BATCH)):
+        check_cancel(cancel)
+        total += sum(counter(batch))
+    return total
+
+
+# Selection
+
+
+@dataclass(frozen=True)
+class BudgetItem:
+    path: Path
+    rel: str  # "/"-separated, matched against priority patterns
+    tokens: int
+
+
+@dataclass(frozen=True)
+class BudgetResult:
+    selected: list[Path]  # in input order
+    dropped: list[Path]  # in input order
+    tokens: int  # total of selected
+
+
+def priority_of(rel: str, priorities: tuple[tuple[str, float], ...]) -> float:
+    # Last matching pattern wins (like ignore rules); unmatched files weigh 1
+    weight = 1.0
+    for pattern, w in priorities:
+        if fnmatchcase(rel, pattern):
+            weight = w
+    return weight
+
+
+def select_within_budget(
+    items: list[BudgetItem],
+    budget: int,
+    strategy: BudgetStrategy = "greedy",
+    priorities: tuple[tuple[str, float], ...] = (),
+) -> BudgetResult:
+    # Picks files to maximize covered priority (each kept file counts its
+    # weight) with total tokens <= budget. Weight 0 or less = never packed.
+    weights = [priority_of(it.rel, priorities) for it in items]
+    candidates = [i for i, w in enumerate(weights) if w > 0]
+    if strategy == "knapsack":
+        chosen = _knapsack(items, weights, candidates, budget)
+    elif strategy == "greedy":
+        chosen = _greedy(items, weights, candidates, budget)
+    else:
+        raise ContextPackerError(f"Unknown budget strategy: {strategy}")
+
+    keep = set(chosen)
+    return BudgetResult(
+        selected=[it.path for i, it in enumerate(items) if i in keep],
+        dropped=[it.path for i, it in enumerate(items) if i not in keep],
+        tokens=sum(items[i].tokens for i in keep),
+    )
+
+
+def _greedy(
+    items: list[BudgetItem],
+    weights: list[float],
+    candidates: list[int],
+    budget: int,
+    chosen: list[int] | None = None,
+) -> list[int]:
+    # Highest weight first, then cheapest: keeps the most files per weight
+    # level. Files that do not fit are skipped, not a stopping point.
+    out = list(chosen or [])
+    taken = set(out)
+    used = sum(items[i].tokens for i in out)
+    order = sorted(
+        candidates, key=lambda i: (-weights[i], items[i].tokens, items[i].rel)
+    )
+    for i in order:
+        t = items[i].tokens
+        if i not in taken and used + t <= budget:
+            out.append(i)
+            used += t
+    return out
+
+
+def _knapsack(
+    items: list[BudgetItem], weights: list[float], candidates: list[int], budget: int
+) -> list[int]:
+    # 0/1 knapsack, value = weight, cost = tokens. Each row is computed with
+    # map() over the whole capacity range rather than a Python inner loop.
+    fits = [i for i in candidates if items[i].tokens <= budget]
+    greedy = _greedy(items, weights, fits, budget)
+    if len({weights[i] for i in fits}) <= 1:
+        # One weight level: cheapest-first is already optimal
+        return greedy
+    unit = max(1, math.ceil(budget * len(fits) / KNAPSACK_CELLS))
+    cap = budget // unit
+
+    best = [0.0] * (cap + 1)  # best value with cost <= c
+    rows: list[tuple[int, int, bytes]] = []  # (item, cost, taken[c - cost])
+    for i in fits:
+        cost = -(-items[i].tokens // unit)
+        if cost > cap:
+            continue
+        v = weights[i]
+        keep = best[cost:]
+        take = [b + v for b in best[: cap + 1 - cost]]
+        rows.append((i, cost, bytes(map(operator.lt, keep, take))))
+        best[cost:] = map(max, keep, take)
+
+    out: list[int] = []
+    c = cap
+    for i, cost, taken in reversed(rows):
+        if c >= cost and taken[c - cost]:
+            out.append(i)
+            c -= cost
+    # Costs were rounded up: fill the slack that leaves, and never do worse
+    # than greedy (bucketing can lose to it on tight budgets)
+    out = _greedy(items, weights, fits, budget, out)
+    if sum(weights[i] for i in greedy) > sum(weights[i] for i in out):
+        return greedy
+    return out
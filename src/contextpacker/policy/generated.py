@@ -0,0 +1,121 @@
+from __future__ import annotations
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+from ..core.cancel import CancelToken
+from ..core.config import Config
+from ..render.compress import compress_text
+
+# Generated and minified files: packed at full size they cost tokens and
+# carry little a reader (or model) can use. Detection reads the text once
+# (a sample of big files, see FileStore.generated); results are cached per
+# (size, mtime) by the FileStore and kept in the manifest.
+
+LOCKFILES = set(
+    "package-lock.json npm-shrinkwrap.json yarn.lock pnpm-lock.yaml bun.lock "
+    "poetry.lock Pipfile.lock pdm.lock uv.lock Cargo.lock composer.lock "
+    "Gemfile.lock go.sum mix.lock pubspec.lock Podfile.lock flake.lock "
+    "packages.lock.json gradle.lockfile".split()
+)
+GENERATED_SUFFIXES = (
+    ".min.js",
+    ".min.css",
+    ".js.map",
+    ".css.map",
+    "_pb2.py",
+    "_pb2.pyi",
+    "_pb2_grpc.py",
+    ".pb.go",
+    ".pb.h",
+    ".pb.cc",
+    ".g.dart",
+    ".designer.cs",
+)
+
+# Line stats tell minified from hand-written text only for code and data:
+# prose (Markdown, reST, ...) is often written one paragraph per line
+MINIFIED_SUFFIXES = set(
+    ".js .mjs .cjs .jsx .ts .tsx .css .scss .less .json .map .html .htm .svg "
+    ".xml".split()
+)
+
+MARKER_LINES = 5  # header lines searched for a "generated" marker
+MINIFIED_MIN = 1024  # line and entropy stats need this many chars
+MINIFIED_MEAN = 200  # mean line length of minified code (source: ~30-40)
+MINIFIED_LONGEST = 5000  # one line this long makes most of a file
+ENTROPY_SAMPLE = 1 << 14  # bytes
+ENTROPY_BITS = 5.7  # per byte; source is ~4-5.4, embedded base64 ~6
+ENTROPY_SPACES = 0.05  # source is ~15% spaces; only sparser text is measured
+
+# Recorded in the manifest like CLASSIFIER_VERSION: bump it when a change
+# here can give a file another reason, so cached reasons are scanned again
+DETECTOR_VERSION = 3
+
+_MARKER = re.compile(
+    r"@generated|auto-?generated|generated (?:by|from|with)|do not edit"
+    r"|code generated .* DO NOT EDIT",
+    re.I,
+)
+
+
+def generated_key(config: Config) -> str:
+    # Like compression_key: "" when generated files are packed as they are
+    return "gs" if config.generated_files == "summarize" else ""
+
+
+def detect_generated(rel: Path, text: str) -> str:
+    # Reason the file looks generated ("lockfile", "name", "marker",
+    # "minified", "entropy"), or "" when it does not
+    name = rel.name
+    if name in LOCKFILES:
+        return "lockfile"
+    if name.endswith(GENERATED_SUFFIXES):
+        return "name"
+    head = "\n".join(text.split("\n", MARKER_LINES)[:MARKER_LINES])
+    if _MARKER.search(head):
+        return "marker"
+    if len(text) < MINIFIED_MIN:
+        return ""
+    if rel.suffix.lower() in MINIFIED_SUFFIXES:
+        if len(text) / (text.count("\n") + 1) > MINIFIED_MEAN:
+            return "minified"
+        if len(text) > MINIFIED_LONGEST:
+            if max(map(len, text.split("\n"))) > MINIFIED_LONGEST:
+                return "minified"
+    # The byte histogram is the slow part: counted for sparse text only
+    sample = text[:ENTROPY_SAMPLE].encode("utf-8", "ignore")
+    if sample.count(b" ") < len(sample) * ENTROPY_SPACES:
+        if _entropy(sample) > ENTROPY_BITS:
+            return "entropy"
+    return ""
+
+
+def packed_text(
+    rel: Path,
+    text: str,
+    config: Config,
+    generated: str = "",
+    cancel: CancelToken | None = None,
+) -> str:
+    # Content of a file's section: the [compress] stage's output, or the
+    # stand-in of a generated file being summarized
+    if generated and config.generated_files == "summarize":
+        return summarize_generated(text, generated)
+    return compress_text(rel, text, config, cancel)
+
+
+def summarize_generated(text: str, reason: str) -> str:
+    # Stands in for the content of a generated file in "summarize" mode
+    lines = len(text.splitlines())
+    size = len(text.encode("utf-8", "ignore"))
+    return f"(generated file: {reason}; {lines} lines, {size} bytes omitted)"
+
+
+def _entropy(data: bytes) -> float:
+    # Shannon entropy of the byte histogram, in bits per byte
+    n = len(data)
+    if not n:
+        return 0.0
+    return -sum(c / n * math.log2(c / n) for c in Counter(data).values())
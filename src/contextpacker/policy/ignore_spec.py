@@ -1,9 +1,11 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+import fnmatch
+import re
 
 from .presets import PRESETS
-from ..io.gitignore import load_gitignore_rules
+from ..io.gitignore import GitignoreMatcher
 
 ALWAYS_IGNORE = {
     ".git",
@@ -23,36 +25,92 @@ ALWAYS_IGNORE = {
 }
 
 
+_GLOB_CHARS = frozenset("*?[")
+
+
 @dataclass(frozen=True)
 class IgnoreSpec:
     project_root: Path
     rules: tuple[str, ...]  # normalized strings
+    gitignore: GitignoreMatcher | None = field(
+        default=None, repr=False, compare=False
+    )
+
+    # Compiled from ALWAYS_IGNORE + rules in __post_init__
+    _exact: frozenset[str] = field(init=False, repr=False, compare=False)
+    _suffixes: frozenset[str] = field(init=False, repr=False, compare=False)
+    _glob: re.Pattern[str] | None = field(init=False, repr=False, compare=False)
+    _memo: dict[str, bool] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        exact: set[str] = set()
+        suffixes: set[str] = set()
+        globs: list[str] = []
+        for r in (*ALWAYS_IGNORE, *self.rules):
+            if not _GLOB_CHARS.intersection(r):
+                exact.add(r)
+            elif r.startswith("*.") and not _GLOB_CHARS.intersection(r[1:]):
+                suffixes.add(r[1:])  # "*.ext" -> ".ext"
+            else:
+                globs.append(fnmatch.translate(r))
+        glob = re.compile("|".join(globs)) if globs else None
+        object.__setattr__(self, "_exact", frozenset(exact))
+        object.__setattr__(self, "_suffixes", frozenset(suffixes))
+        object.__setattr__(self, "_glob", glob)
+        object.__setattr__(self, "_memo", {})
 
     def matches_name(self, name: str) -> bool:
-        # Exact names or simple suffix wildcard: "*.ext"
-        # combines ALWAYS_IGNORE and configured rules for uniform matching
-        combined = list(ALWAYS_IGNORE) + list(self.rules)
-        for r in combined:
-            if r == name:
-                return True
-            if r.startswith("*.") and name.endswith(r[1:]):
+        # Exact names, "*.ext" suffixes (one set lookup per "." in the name)
+        # and any other glob via one combined regex; memoized per basename.
+        hit = self._memo.get(name)
+        if hit is not None:
+            return hit
+        result = self._match_uncached(name)
+        self._memo[name] = result
+        return result
+
+    def _match_uncached(self, name: str) -> bool:
+        if name in self._exact:
+            return True
+        suffixes = self._suffixes
+        i = name.find(".")
+        while i != -1:
+            if name[i:] in suffixes:
                 return True
-        return False
+            i = name.find(".", i + 1)
+        return self._glob is not None and self._glob.match(name) is not None
+
+    def is_ignored_rel(self, rel: str, is_dir: bool) -> bool:
+        # rel: "/"-separated path below project_root
+        name = rel[rel.rfind("/") + 1 :]
+        if self.matches_name(name):
+            return True
+        return self.gitignore is not None and self.gitignore.is_ignored(rel, is_dir)
 
-    def is_ignored_path(self, path: Path) -> bool:
-        return self.matches_name(path.name)
+    def is_ignored_path(self, path: Path, is_dir: bool | None = None) -> bool:
+        if self.matches_name(path.name):
+            return True
+        if self.gitignore is None:
+            return False
+        try:
+            rel = path.relative_to(self.project_root).as_posix()
+        except ValueError:
+            return False
+        if rel == ".":
+            return False
+        if is_dir is None:
+            is_dir = path.is_dir()
+        return self.gitignore.is_ignored(rel, is_dir)
 
 
 def compile_ignore(project_root: Path, preset: str) -> IgnoreSpec:
     root = Path(project_root).resolve()
     preset_rules = PRESETS.get(preset, set())
-    gitignore_rules = load_gitignore_rules(root / ".gitignore")
-
-    # This is intentionally conservative, gitignore parsing is partial.
-    merged = set()
-    merged |= set(preset_rules)
-    merged |= set(gitignore_rules)
 
     # normalize, strip empties
-    norm = tuple(sorted({r.strip() for r in merged if r and r.strip()}))
-    return IgnoreSpec(project_root=root, rules=norm)
+    norm = tuple(sorted({r.strip() for r in preset_rules if r and r.strip()}))
+
+    # .gitignore files (nested) and .git/info/exclude, loaded per directory
+    # on first use
+    gitignore = GitignoreMatcher(root)
+    return IgnoreSpec(project_root=root, rules=norm, gitignore=gitignore)
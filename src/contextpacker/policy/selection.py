@@ -2,22 +2,29 @@ from __future__ import annotations
 from pathlib import Path
 
 from ..core.config import Config
-from ..core.model import Snapshot
+from ..core.model import Node
+from ..core.compact_model import AnySnapshot
 from .ignore_spec import IgnoreSpec
-from ..io.file_read import is_probably_text
+from ..io.file_store import FileStore
 
 
-def _top_level_children(snapshot: Snapshot) -> list[Path]:
+def _is_ignored(ignore: IgnoreSpec, node: Node) -> bool:
+    return ignore.is_ignored_rel(node.rel_path.as_posix(), node.is_dir)
+
+
+def _top_level_children(snapshot: AnySnapshot) -> list[Path]:
     return snapshot.children.get(snapshot.root, [])
 
 
 def compute_tree_roots_and_visibility(
-    snapshot: Snapshot,
+    snapshot: AnySnapshot,
     config: Config,
     ignore: IgnoreSpec,
-) -> tuple[list[Path], set[Path]]:
+    files: FileStore,
+) -> tuple[list[Path], set[Path], dict[Path, list[Path]]]:
     # roots: the items the user selected + (optional) root-level text files
     # visible_nodes: all nodes reachable under those roots excluding ignored names
+    # visible_children: each visible directory's visible children, in order
 
     selected = set(config.selected_top_level)
 
@@ -26,10 +33,12 @@ def compute_tree_roots_and_visibility(
 
     # 1) Selected top-level items (dirs or files)
     for child in _top_level_children(snapshot):
-        if ignore.is_ignored_path(child):
+        if child.name not in selected:
+            continue
+        node = snapshot.nodes.get(child)
+        if node is None or _is_ignored(ignore, node):
             continue
-        if child.name in selected:
-            roots.append(child)
+        roots.append(child)
 
     # 2) Root-level text files included even if not selected (bugfix requirement)
     if config.include_root_text_files:
@@ -37,33 +46,40 @@ def compute_tree_roots_and_visibility(
             node = snapshot.nodes.get(child)
             if node is None or node.is_dir:
                 continue
-            if ignore.is_ignored_path(child):
+            if _is_ignored(ignore, node):
                 continue
             # conservative: include only "probably text" and within max bytes gate later
-            if is_probably_text(child):
+            if files.is_text(node):
                 roots.append(child)
 
     # Dedup + stable order
     roots = sorted({p for p in roots}, key=lambda x: str(x))
 
-    # Traverse under roots, applying ignore-by-name
-    def visit(p: Path):
-        if ignore.is_ignored_path(p):
-            return
-        visible.add(p)
+    # Traverse under roots, applying ignore rules; an explicit stack, so
+    # deep trees do not hit the recursion limit
+    def shown(p: Path) -> bool:
         node = snapshot.nodes.get(p)
-        if node and node.is_dir:
-            for ch in snapshot.children.get(p, []):
-                visit(ch)
+        if node is not None:
+            return not _is_ignored(ignore, node)
+        return not ignore.is_ignored_path(p)
 
-    for r in roots:
-        visit(r)
+    visible_children: dict[Path, list[Path]] = {}
+    stack = [r for r in roots if shown(r)]
+    visible.update(stack)
+    while stack:
+        p = stack.pop()
+        node = snapshot.nodes.get(p)
+        if node and node.is_dir:
+            kids = [ch for ch in snapshot.children.get(p, []) if shown(ch)]
+            visible_children[p] = kids
+            visible.update(kids)
+            stack.extend(kids)
 
-    return roots, visible
+    return roots, visible, visible_children
 
 
 def compute_files_to_read(
-    snapshot: Snapshot,
+    snapshot: AnySnapshot,
     config: Config,
     ignore: IgnoreSpec,
     visible_nodes: set[Path],
@@ -73,7 +89,7 @@ def compute_files_to_read(
         node = snapshot.nodes.get(p)
         if not node or node.is_dir:
             continue
-        if ignore.is_ignored_path(p):
+        if _is_ignored(ignore, node):
             continue
         files.append(p)
     return sorted(files, key=lambda x: str(x))
@@ -0,0 +1,380 @@
+from __future__ import annotations
+import ast
+import json
+import re
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ..core.cancel import CancelToken, check_cancel
+from ..core.config import Config
+
+CANCEL_EVERY = 4096  # lines (or tokens) between cancel checks
+
+# Stands in for a removed comment until lines are cleaned up; text files
+# carry no NULs (binary sniff), so it cannot clash with content
+_MARK = "\0"
+
+# Comment syntax by file suffix (lower case) or exact file name
+_HASH = set(
+    ".sh .bash .zsh .rb .pl .r .yaml .yml .toml .cfg .ini .conf .ps1 "
+    ".cmake .mk .tf .nix".split()
+)
+_HASH_NAMES = set(
+    "Makefile Dockerfile Gemfile Rakefile CMakeLists.txt .gitignore "
+    ".dockerignore .gitattributes .editorconfig".split()
+)
+_C = set(
+    ".c .h .cc .cpp .cxx .hpp .hh .m .mm .java .kt .kts .scala .groovy "
+    ".gradle .cs .go .rs .swift .dart .js .jsx .mjs .cjs .ts .tsx .php "
+    ".proto .jsonc".split()
+)
+_BLOCK_ONLY = {".css", ".scss", ".less"}  # "//" can be part of an url(...)
+_DASH = {".sql", ".lua", ".hs"}
+_XML = {".html", ".htm", ".xml", ".svg", ".xaml", ".csproj", ".props"}
+_PYTHON = {".py", ".pyi", ".pyw"}
+_JSON = {".json"}  # plus JSON lockfiles (package-lock.json, composer.lock, ...)
+_JSON_NAMES = {"composer.lock", "Pipfile.lock", ".babelrc", ".eslintrc"}
+
+_STR = r'"(?:\\.|[^"\\\n])*"|' r"'(?:\\.|[^'\\\n])*'"
+_COMMENT_RES = {
+    "c": re.compile(_STR + r"|`(?:\\.|[^`\\])*`|(//[^\n]*|/\*.*?\*/)", re.S),
+    "block": re.compile(_STR + r"|(/\*.*?\*/)", re.S),
+    "hash": re.compile(_STR + r"|((?:^|(?<=[ \t]))#[^\n]*)", re.M),
+    "dash": re.compile(_STR + r"|(--\[\[.*?\]\]|--[^\n]*)", re.S),
+    "xml": re.compile(r"(<!--.*?-->)", re.S),
+    "python": re.compile(
+        r'"""(?:\\.|[^\\])*?"""|' r"'''(?:\\.|[^\\])*?'''|" + _STR + r"|(#[^\n]*)",
+        re.S,
+    ),
+}
+
+# Brace-delimited function bodies (C family): strings and comments are
+# matched so braces inside them are not counted
+_BRACES = re.compile(
+    _STR + r"|`(?:\\.|[^`\\])*`|//[^\n]*|/\*.*?\*/|([{};])", re.S
+)
+_CONTROL = set(
+    "if else elseif for foreach while do switch case catch try finally with "
+    "using lock match when guard loop unsafe synchronized return new throw "
+    "yield await defer go".split()
+)
+# Headers that declare a type: class Foo(val x: Int), record P(int x), ...
+# (struct/enum/union and object also name types in C and C#, so they only
+# count right before the parentheses or ahead of a supertype)
+_DECL = re.compile(
+    r"\b(?:class|interface|record|trait|impl|namespace|protocol|extension)\b"
+)
+_TYPE_DECL = re.compile(
+    r"\b(?:struct|enum|union)\s+[\w.]+\s*$|\bobject\b(?:\s+\w+)?\s*(?::|extends\b)"
+)
+# What may follow a parameter list before "{": qualifiers, throws clauses
+# and a return type (after ":" or "->", or one bare token as in Go)
+_SUFFIX = re.compile(
+    r"(?:(?:const|noexcept|override|final|mutable|volatile|async\*?|sync\*"
+    r"|throws|rethrows|&&|&)\s*)*"
+    r"(?:throws\s+[\w.]+(?:\s*,\s*[\w.]+)*\s*)?"
+    r"(?:(?::|->)\s*[^{};=]+?|[\w.*&\[\]]+)?\s*(?:=>)?"
+)
+_WHERE = re.compile(r"\)[^()]*?(\bwhere\b)")  # generic constraints: cut
+_GENERICS = re.compile(r"<[^<>]*>")
+_PREPROCESSOR = re.compile(r"^[ \t]*#(?!!?\[).*$", re.M)
+_ANNOTATION = re.compile(r"@[\w.:]+\s*|#!?(?=\[)")
+_HEADER_TOKEN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])\'|([()\[\]])'
+)
+_LAST_NAME = re.compile(r"[\w$]+\s*$")
+_LEADING_WORD = re.compile(r"[A-Za-z_]\w*")
+_JSON_SPACE = re.compile(r'("(?:\\.|[^"\\])*")|\s+')
+
+
+def compression_key(config: Config) -> str:
+    # Identifies the content transform; "" when content is packed verbatim.
+    # Anything cached per rendered section must be keyed on it.
+    steps = (
+        ("e", config.elide_bodies),
+        ("j", config.minify_json),
+        ("c", config.strip_comments),
+        ("b", config.collapse_blank_lines),
+    )
+    return "".join(k for k, on in steps if on)
+
+
+def compress_text(
+    rel: Path, text: str, config: Config, cancel: CancelToken | None = None
+) -> str:
+    # Per-file [compress] stage: runs between reading and rendering. Steps
+    # that cannot parse a file leave it as it is.
+    key = compression_key(config)
+    if not key:
+        return text
+    family = _family(rel)
+    if "e" in key:
+        if family == "python":
+            text = _elide_python(text, cancel)
+        elif family == "c":
+            text = _elide_braces(text, cancel)
+    if "j" in key and family == "json":
+        text = _minify_json(text)
+    # Split on "\n" only (content is newline-normalized): str.splitlines()
+    # also breaks at form feeds and other separators
+    lines: Iterable[str] = text.split("\n")
+    if "c" in key and family in _COMMENT_RES:
+        lines = _drop_marks(_mark_comments(text, family).split("\n"), cancel)
+    if "b" in key:
+        lines = _collapse_blank(lines, cancel)
+    return "\n".join(lines)
+
+
+def _family(rel: Path) -> str:
+    name, suffix = rel.name, rel.suffix.lower()
+    if suffix in _PYTHON:
+        return "python"
+    if suffix in _JSON or name in _JSON_NAMES or name.endswith("-lock.json"):
+        return "json"
+    if suffix in _C:
+        return "c"
+    if suffix in _BLOCK_ONLY:
+        return "block"
+    if suffix in _HASH or name in _HASH_NAMES:
+        return "hash"
+    if suffix in _DASH:
+        return "dash"
+    if suffix in _XML:
+        return "xml"
+    return ""
+
+
+def _split_keepends(text: str) -> list[str]:
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+# Comments
+
+
+def _mark_comments(text: str, family: str) -> str:
+    shebang = ""
+    if family in ("hash", "python") and text.startswith("#!"):
+        shebang, _, text = text.partition("\n")
+        shebang += "\n"
+
+    def repl(m: re.Match[str]) -> str:
+        return _MARK if m.group(1) is not None else m.group(0)
+
+    return shebang + _COMMENT_RES[family].sub(repl, text)
+
+
+def _drop_marks(lines: Iterable[str], cancel: CancelToken | None) -> Iterator[str]:
+    # Lines that held only a comment go away; others lose the comment and
+    # the whitespace before it
+    for i, line in enumerate(lines):
+        if i % CANCEL_EVERY == 0:
+            check_cancel(cancel)
+        if _MARK not in line:
+            yield line
+            continue
+        rest = line.replace(_MARK, "").rstrip()
+        if rest:
+            yield rest
+
+
+def _collapse_blank(lines: Iterable[str], cancel: CancelToken | None) -> Iterator[str]:
+    # Whitespace-only lines become empty; runs of them (and any at the start
+    # or end of the file) collapse to one / none
+    blank = False
+    started = False
+    for i, line in enumerate(lines):
+        if i % CANCEL_EVERY == 0:
+            check_cancel(cancel)
+        if not line.strip():
+            blank = started
+            continue
+        if blank:
+            yield ""
+            blank = False
+        started = True
+        yield line
+
+
+# JSON
+
+
+def _minify_json(text: str) -> str:
+    # Whitespace outside strings only, so numbers and key order stay as
+    # written; files that are not plain JSON (comments, JSON lines) are kept
+    try:
+        json.loads(text)
+    except ValueError:
+        return text
+    return _JSON_SPACE.sub(lambda m: m.group(1) or "", text)
+
+
+# Bodies
+
+
+def _elide_python(text: str, cancel: CancelToken | None) -> str:
+    # Function and method bodies become "..." after their docstring;
+    # signatures, decorators, classes and module-level code are kept
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return text
+    lines = _split_keepends(text)
+    spans: list[tuple[int, int, int]] = []  # (first row, last row, indent)
+    stack: list[ast.AST] = [tree]
+    while stack:
+        check_cancel(cancel)
+        for child in ast.iter_child_nodes(stack.pop()):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                span = _python_body(child, lines)
+                if span is not None:
+                    spans.append(span)
+            elif not isinstance(child, ast.expr):
+                stack.append(child)
+
+    for first, last, indent in sorted(spans, reverse=True):
+        lines[first - 1 : last] = [" " * indent + "...\n"]
+    return "".join(lines)
+
+
+def _python_body(
+    fn: ast.FunctionDef | ast.AsyncFunctionDef, lines: list[str]
+) -> tuple[int, int, int] | None:
+    body = fn.body
+    if ast.get_docstring(fn, clean=False) is not None:
+        body = body[1:]
+    if not body or fn.end_lineno is None:
+        return None
+    stmt = body[0]
+    # A decorated statement starts at its first decorator
+    decorators = getattr(stmt, "decorator_list", [])
+    first = min([stmt.lineno] + [d.lineno for d in decorators])
+    line = lines[first - 1]
+    # Body on the signature line ("def f(): return 1"): already short
+    if line[: stmt.col_offset].strip():
+        return None
+    if len(body) == 1 and isinstance(stmt, ast.Expr) and _is_ellipsis(stmt.value):
+        return None
+    return first, fn.end_lineno, stmt.col_offset
+
+
+def _is_ellipsis(node: ast.expr) -> bool:
+    return isinstance(node, ast.Constant) and node.value is Ellipsis
+
+
+def _elide_braces(text: str, cancel: CancelToken | None) -> str:
+    # Lightweight scan for C-like languages: a "{" whose header (text since
+    # the previous ";", "{" or "}") reads like a signature starts a body,
+    # which is replaced by "..." up to its matching "}"
+    out: list[str] = []
+    pos = 0
+    header_start = 0
+    depth = 0
+    eliding_at: int | None = None
+    body_start = 0
+    for i, m in enumerate(_BRACES.finditer(text)):
+        if i % CANCEL_EVERY == 0:
+            check_cancel(cancel)
+        tok = m.group(1)
+        if tok is None:
+            continue
+        if tok == "{":
+            if eliding_at is None and _is_signature(text[header_start : m.start()]):
+                eliding_at = depth
+                body_start = m.end()
+            depth += 1
+        elif tok == "}":
+            depth = max(0, depth - 1)
+            if eliding_at == depth:
+                out.append(text[pos:body_start])
+                out.append(" ... ")
+                pos = m.start()
+                eliding_at = None
+        header_start = m.end()
+    # Unbalanced braces: an open body is left as it is
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def _is_signature(header: str) -> bool:
+    # A parameter list is the last thing before "{" (bar qualifiers and a
+    # return type), and what comes before it is a name, not a control
+    # keyword or a type being declared. Annotations, attributes and
+    # preprocessor lines in front are dropped first.
+    if ")" not in header:
+        return False
+    h = re.sub(r"//[^\n]*|/\*.*?\*/", "", header, flags=re.S)
+    h = _drop_annotations(_PREPROCESSOR.sub("", h).lstrip("} \t\r\n"))
+    m = _WHERE.search(h)
+    if m is not None:
+        h = h[: m.start(1)]
+    groups = _paren_groups(h.rstrip())
+    if not groups:
+        return False
+    for start, end in reversed(groups):
+        if _SUFFIX.fullmatch(h[end:].strip()):
+            break
+    else:
+        return False
+    prefix = h[:start]
+    first = _LEADING_WORD.match(prefix.lstrip())
+    if first is not None and first.group(0) in _CONTROL:
+        return False
+    while True:
+        # template <class T>, Map<K, V>: generic arguments are not the header
+        stripped = _GENERICS.sub("", prefix)
+        if stripped == prefix:
+            break
+        prefix = stripped
+    # The name before the parentheses may be any word (void record(...))
+    if _DECL.search(_LAST_NAME.sub("", prefix)):
+        return False
+    return _TYPE_DECL.search(prefix) is None
+
+
+def _drop_annotations(h: str) -> str:
+    # Leading @Annotation(args), [Attribute(args)] and #[attr] groups
+    while True:
+        m = _ANNOTATION.match(h)
+        end = m.end() if m is not None else 0
+        if end < len(h) and h[end] in "([" and (m is not None or h[end] == "["):
+            end = _group_end(h, end)
+            if end < 0:
+                return h
+        if not end:
+            return h
+        h = h[end:].lstrip()
+
+
+def _group_end(h: str, start: int) -> int:
+    # Index just past the bracket group opened at h[start]; -1 if unclosed
+    depth = 0
+    for m in _HEADER_TOKEN.finditer(h, start):
+        tok = m.group(1)
+        if tok is None:
+            continue
+        depth += 1 if tok in "([" else -1
+        if not depth:
+            return m.end()
+    return -1
+
+
+def _paren_groups(h: str) -> list[tuple[int, int]]:
+    # (start, end) of each top-level "(...)" in h; none if they do not balance
+    groups: list[tuple[int, int]] = []
+    depth = 0
+    start = 0
+    for m in _HEADER_TOKEN.finditer(h):
+        tok = m.group(1)
+        if tok == "(":
+            if not depth:
+                start = m.start()
+            depth += 1
+        elif tok == ")":
+            depth -= 1
+            if depth < 0:
+                return []
+            if not depth:
+                groups.append((start, m.end()))
+    return groups if not depth else []
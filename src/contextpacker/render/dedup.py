@@ -0,0 +1,118 @@
+from __future__ import annotations
+import hashlib
+import heapq
+from pathlib import Path
+from typing import NamedTuple
+
+from ..core.config import Config
+from ..io.file_store import content_digest
+from .diff_render import unified_diff_text
+from .transcript_render import render_section
+
+SKETCH_SIZE = 64  # bottom-k MinHash: the k smallest hashes of a file's lines
+INDEX_KEYS = 4  # smallest hashes a sketch is indexed under
+BUCKET_PROBE = 8  # newest canonicals compared per key; keeps the pass linear
+MIN_LINE = 4  # shorter lines ("}", "pass", "end") carry no signal
+MAX_DIFF_RATIO = 0.5  # near-dup diff must be at most this share of the file
+
+Sketch = tuple[int, ...]
+
+
+class DupRef(NamedTuple):
+    canonical: str  # "/"-separated rel path of the copy that is packed
+    path: Path  # its absolute path
+    exact: bool
+    digest: str  # digest of the duplicate's section (own + canonical content)
+
+
+def dedup_key(config: Config) -> str:
+    # Like compression_key: identifies how sections are rendered
+    if config.dedup == "off":
+        return ""
+    return f"d{config.dedup}{config.near_dup_similarity}:{config.dedup_min_bytes}"
+
+
+def sketch(text: str) -> Sketch:
+    # Distinct non-trivial lines, ignoring indentation, hashed; the SKETCH_SIZE
+    # smallest hashes stand for the whole file (ascending)
+    lines = {line.strip() for line in text.split("\n")}
+    hashes = {
+        int.from_bytes(hashlib.blake2b(line.encode(), digest_size=8).digest(), "big")
+        for line in lines
+        if len(line) >= MIN_LINE
+    }
+    return tuple(heapq.nsmallest(SKETCH_SIZE, hashes))
+
+
+def similarity(a: Sketch, b: Sketch) -> float:
+    # Bottom-k estimate of the Jaccard similarity of the two line sets
+    if not a or not b:
+        return 0.0
+    sa, sb = set(a), set(b)
+    union = heapq.nsmallest(SKETCH_SIZE, sa | sb)
+    return sum(1 for h in union if h in sa and h in sb) / len(union)
+
+
+class _Canonical(NamedTuple):
+    rel: str
+    path: Path
+    digest: str
+    sketch: Sketch
+
+
+class Deduper:
+    # Single pass in transcript order: each file is looked up among the
+    # canonical files before it, then (if not a duplicate) becomes one.
+    # Exact copies match by content hash; near copies through sketches
+    # indexed by their smallest hashes, comparing a bounded number of
+    # candidates per key.
+    def __init__(self, config: Config) -> None:
+        self.near = config.dedup == "near"
+        self.threshold = config.near_dup_similarity
+        self.min_bytes = config.dedup_min_bytes  # smaller files are packed as is
+        self._canon: list[_Canonical] = []
+        self._by_digest: dict[str, int] = {}
+        self._buckets: dict[int, list[int]] = {}
+        self.duplicates = 0
+
+    def find(self, digest: str, sk: Sketch) -> DupRef | None:
+        hit = self._by_digest.get(digest)
+        if hit is not None:
+            return self._ref(self._canon[hit], digest, exact=True)
+        if not self.near or not sk:
+            return None
+        best, best_sim = None, self.threshold
+        for key in sk[:INDEX_KEYS]:
+            for i in self._buckets.get(key, [])[-BUCKET_PROBE:]:
+                sim = similarity(sk, self._canon[i].sketch)
+                if sim >= best_sim:
+                    best, best_sim = i, sim
+        if best is None:
+            return None
+        return self._ref(self._canon[best], digest, exact=False)
+
+    def add(self, rel: str, path: Path, digest: str, sk: Sketch) -> None:
+        i = len(self._canon)
+        self._canon.append(_Canonical(rel, path, digest, sk))
+        self._by_digest.setdefault(digest, i)
+        if self.near:
+            for key in sk[:INDEX_KEYS]:
+                self._buckets.setdefault(key, []).append(i)
+
+    @staticmethod
+    def _ref(c: _Canonical, digest: str, exact: bool) -> DupRef:
+        both = content_digest(f"{digest}\0{c.rel}\0{c.digest}".encode())
+        return DupRef(c.rel, c.path, exact, both)
+
+
+def render_duplicate(
+    rel: Path, dup: DupRef, content: str = "", canonical_content: str = ""
+) -> str | None:
+    # Section of a duplicate: a reference to the canonical copy, plus the
+    # diff from it for a near copy. None when the diff saves too little.
+    if dup.exact or content == canonical_content:
+        return render_section(rel, f"(same content as {dup.canonical})")
+    diff = unified_diff_text(canonical_content, content, dup.canonical, rel.as_posix())
+    if not diff or len(diff) > len(content) * MAX_DIFF_RATIO:
+        return None
+    return render_section(rel, f"(near-duplicate of {dup.canonical}; diff:)\n{diff}")
@@ -1,22 +1,414 @@
 from __future__ import annotations
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Sequence
 import difflib
+import hashlib
+import re
 
+from .transcript_render import SEPARATOR
 
-def unified_diff_text(old: str, new: str) -> str:
+FROM_FILE = "Previous_Transcript"
+TO_FILE = "Current_Transcript"
+CONTEXT = 3
+
+# Regions with no unique common line fall back to difflib only below this
+# many cells (len(a) * len(b)); larger ones are emitted as a plain replace.
+FALLBACK_CELLS = 1_000_000
+
+READ_BLOCK = 1 << 20
+
+# Yields the transcript text in blocks of any size
+TextSource = Callable[[], Iterator[str]]
+
+
+def unified_diff_text(
+    old: str, new: str, from_file: str = FROM_FILE, to_file: str = TO_FILE
+) -> str:
     if not old:
         # First Run: No Diff
         return ""
     if old == new:
         # No Changes
         return ""
-
-    old_lines = old.splitlines()
-    new_lines = new.splitlines()
-    diff = difflib.unified_diff(
-        old_lines,
-        new_lines,
-        fromfile="Previous_Transcript",
-        tofile="Current_Transcript",
-        lineterm="",
+    return _diff_sources(
+        lambda: iter((old,)), lambda: iter((new,)), (from_file, to_file)
     )
-    return "\n".join(diff)
+
+
+def unified_diff_files(old_path: Path, new_path: Path) -> str:
+    # Same output as unified_diff_text on the two files' contents, without
+    # holding either transcript in memory: only changed sections are loaded.
+    old_p, new_p = Path(old_path), Path(new_path)
+    try:
+        if old_p.stat().st_size == 0:
+            return ""
+    except OSError:
+        return ""
+    return _diff_sources(lambda: _file_blocks(old_p), lambda: _file_blocks(new_p))
+
+
+class SectionRef(NamedTuple):
+    # A transcript section known without reading it (e.g. from the section
+    # index): its lines are only loaded if the diff needs them.
+    key: str
+    digest: str
+    count: int  # number of lines, as str.splitlines() counts them
+    load: Callable[[], list[str]]
+
+
+def unified_diff_sections(old: list[SectionRef], new: list[SectionRef]) -> str:
+    if not old:
+        return ""
+    a = [_Section(r.key, r.digest, r.count, load=r.load) for r in old]
+    b = [_Section(r.key, r.digest, r.count, load=r.load) for r in new]
+    return _diff_sections(a, b)
+
+
+def _file_blocks(path: Path) -> Iterator[str]:
+    # Decoded like read_text(encoding="utf-8", errors="ignore")
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            yield from iter(lambda: f.read(READ_BLOCK), "")
+    except OSError:
+        return
+
+
+# Sections
+
+
+@dataclass
+class _Section:
+    key: str  # "File: <rel>" line (deduplicated), "" for the header
+    digest: bytes | str
+    count: int
+    lines: list[str] | None = None
+    collapsed: bool = False  # lines holds only the first/last CONTEXT lines
+    load: Callable[[], list[str]] | None = None  # all lines, on demand
+
+    def all_lines(self) -> list[str]:
+        if (self.lines is None or self.collapsed) and self.load is not None:
+            self.lines, self.collapsed = self.load(), False
+        return self.lines or []
+
+    def line(self, i: int) -> str:
+        lines = self.lines if self.lines is not None else self.all_lines()
+        if not self.collapsed or i < CONTEXT:
+            return lines[i]
+        return lines[CONTEXT + i - (self.count - CONTEXT)]
+
+
+# A section starts at "File: ..." right after a separator line (or the blank
+# line closing the header). A false split inside file content only costs
+# precision, never correctness: cuts always follow a "\n", so splitlines()
+# per section concatenates to splitlines() of the whole text.
+_BOUNDARY = re.compile("\n(?:%s)?\n(?=File: )" % re.escape(SEPARATOR))
+_OVERLAP = len(SEPARATOR) + len("\n\nFile: ")
+
+
+def _split(blocks: Iterable[str]) -> Iterator[str]:
+    buf = ""
+    for block in blocks:
+        start = max(0, len(buf) - _OVERLAP)
+        buf += block
+        pos = 0
+        for m in _BOUNDARY.finditer(buf, start):
+            yield buf[pos : m.end()]
+            pos = m.end()
+        buf = buf[pos:]
+    yield buf
+
+
+def _scan(source: TextSource) -> list[_Section]:
+    out: list[_Section] = []
+    seen: dict[str, int] = {}
+    for idx, text in enumerate(_split(source())):
+        key = text.partition("\n")[0] if idx else ""
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        digest = hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"), digest_size=16
+        ).digest()
+        count = len(text.splitlines())
+        out.append(_Section(f"{key}\0{n}" if n else key, digest, count))
+    return out
+
+
+def _load(source: TextSource, sections: list[_Section], full: set[int]) -> None:
+    # Second pass: keep every line of sections that take part in a change,
+    # only the context head/tail of sections known to be unchanged.
+    for idx, text in enumerate(_split(source())):
+        s = sections[idx]
+        lines = text.splitlines()
+        if idx in full or s.count <= 2 * CONTEXT:
+            s.lines = lines
+        else:
+            s.lines = lines[:CONTEXT] + lines[-CONTEXT:]
+            s.collapsed = True
+
+
+# Diff
+
+
+def _diff_sources(
+    old: TextSource, new: TextSource, labels: tuple[str, str] = (FROM_FILE, TO_FILE)
+) -> str:
+    a, b = _scan(old), _scan(new)
+
+    def fill(full_a: set[int], full_b: set[int]) -> None:
+        _load(old, a, full_a)
+        _load(new, b, full_b)
+
+    return _diff_sections(a, b, fill, labels)
+
+
+def _diff_sections(
+    a: list[_Section],
+    b: list[_Section],
+    fill: Callable[[set[int], set[int]], None] | None = None,
+    labels: tuple[str, str] = (FROM_FILE, TO_FILE),
+) -> str:
+    ka, kb = [s.key for s in a], [s.key for s in b]
+    if ka == kb and all(x.digest == y.digest for x, y in zip(a, b)):
+        return ""
+
+    # Sections paired by key with equal content are never line-diffed
+    pairs = [
+        (i + k, j + k)
+        for i, j, n in _matching_blocks(ka, kb)
+        for k in range(n)
+        if a[i + k].digest == b[j + k].digest
+    ]
+    same_a = {i for i, _ in pairs}
+    same_b = {j for _, j in pairs}
+    if fill is not None:
+        fill(set(range(len(a))) - same_a, set(range(len(b))) - same_b)
+
+    off_a, off_b = _offsets(a), _offsets(b)
+    codes: list[tuple[str, int, int, int, int]] = []
+    pi = pj = 0  # next unpaired section on each side
+    for i, j in [*pairs, (len(a), len(b))]:
+        # changed/moved/added/removed sections between two unchanged ones
+        if pi < i or pj < j:
+            codes += _line_opcodes(a[pi:i], b[pj:j], off_a[pi], off_b[pj])
+        if i < len(a):
+            codes.append(("equal", off_a[i], off_a[i + 1], off_b[j], off_b[j + 1]))
+        pi, pj = i + 1, j + 1
+
+    return "\n".join(_format(_merge(codes), a, b, off_a, off_b, labels))
+
+
+def _offsets(sections: list[_Section]) -> list[int]:
+    out = [0]
+    for s in sections:
+        out.append(out[-1] + s.count)
+    return out
+
+
+def _line_opcodes(
+    a_secs: list[_Section], b_secs: list[_Section], a0: int, b0: int
+) -> list[tuple[str, int, int, int, int]]:
+    # Line-level diff of one run of changed, added or removed sections
+    a = [line for s in a_secs for line in s.all_lines()]
+    b = [line for s in b_secs for line in s.all_lines()]
+    codes = []
+    i = j = 0
+    for bi, bj, n in [*_matching_blocks(a, b), (len(a), len(b), 0)]:
+        if i < bi and j < bj:
+            codes.append(("replace", a0 + i, a0 + bi, b0 + j, b0 + bj))
+        elif i < bi:
+            codes.append(("delete", a0 + i, a0 + bi, b0 + j, b0 + j))
+        elif j < bj:
+            codes.append(("insert", a0 + i, a0 + i, b0 + j, b0 + bj))
+        if n:
+            codes.append(("equal", a0 + bi, a0 + bi + n, b0 + bj, b0 + bj + n))
+        i, j = bi + n, bj + n
+    return codes
+
+
+def _merge(
+    codes: list[tuple[str, int, int, int, int]]
+) -> list[tuple[str, int, int, int, int]]:
+    out: list[tuple[str, int, int, int, int]] = []
+    for c in codes:
+        if c[1] == c[2] and c[3] == c[4]:
+            continue
+        if out and out[-1][0] == c[0] == "equal":
+            prev = out.pop()
+            c = ("equal", prev[1], c[2], prev[3], c[4])
+        out.append(c)
+    return out or [("equal", 0, 0, 0, 0)]
+
+
+# Patience matching: anchor on lines unique to both sides, recurse between
+# anchors; O(n log n) and stable on highly repetitive input (separators,
+# brackets, blank lines) where difflib degrades to quadratic.
+
+
+def _matching_blocks(a: Sequence, b: Sequence) -> list[tuple[int, int, int]]:
+    blocks: list[tuple[int, int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        n = 0
+        while alo + n < ahi and blo + n < bhi and a[alo + n] == b[blo + n]:
+            n += 1
+        if n:
+            blocks.append((alo, blo, n))
+            alo, blo = alo + n, blo + n
+        n = 0
+        while alo < ahi - n and blo < bhi - n and a[ahi - 1 - n] == b[bhi - 1 - n]:
+            n += 1
+        if n:
+            blocks.append((ahi - n, bhi - n, n))
+            ahi, bhi = ahi - n, bhi - n
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_lcs(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            if (ahi - alo) * (bhi - blo) <= FALLBACK_CELLS:
+                sm = difflib.SequenceMatcher(
+                    None, a[alo:ahi], b[blo:bhi], autojunk=False
+                )
+                blocks += [
+                    (alo + i, blo + j, k) for i, j, k in sm.get_matching_blocks() if k
+                ]
+            continue
+
+        pi, pj = alo, blo
+        for i, j in anchors:
+            stack.append((pi, i, pj, j))
+            blocks.append((i, j, 1))
+            pi, pj = i + 1, j + 1
+        stack.append((pi, ahi, pj, bhi))
+
+    blocks.sort()
+    merged: list[tuple[int, int, int]] = []
+    for i, j, n in blocks:
+        if merged:
+            pi, pj, pn = merged[-1]
+            if pi + pn == i and pj + pn == j:
+                merged[-1] = (pi, pj, pn + n)
+                continue
+        merged.append((i, j, n))
+    return merged
+
+
+def _unique_lcs(
+    a: Sequence, b: Sequence, alo: int, ahi: int, blo: int, bhi: int
+) -> list[tuple[int, int]]:
+    count_a: dict = {}
+    for i in range(alo, ahi):
+        count_a[a[i]] = count_a.get(a[i], 0) + 1
+    pos_b: dict = {}
+    for j in range(blo, bhi):
+        x = b[j]
+        if count_a.get(x) == 1:
+            pos_b[x] = -1 if x in pos_b else j
+    pairs = [
+        (i, pos_b[a[i]])
+        for i in range(alo, ahi)
+        if count_a[a[i]] == 1 and pos_b.get(a[i], -1) >= 0
+    ]
+    if not pairs:
+        return []
+
+    # Longest increasing subsequence of b positions (patience sorting)
+    tails: list[int] = []  # b position ending each pile
+    tops: list[int] = []  # index into pairs of each pile's top
+    back: list[int] = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        p = bisect_right(tails, j)
+        if p:
+            back[k] = tops[p - 1]
+        if p == len(tails):
+            tails.append(j)
+            tops.append(k)
+        else:
+            tails[p] = j
+            tops[p] = k
+    out: list[tuple[int, int]] = []
+    k = tops[-1]
+    while k != -1:
+        out.append(pairs[k])
+        k = back[k]
+    out.reverse()
+    return out
+
+
+# Output: same shape as difflib.unified_diff(lineterm="")
+
+
+def _format(
+    codes: list[tuple[str, int, int, int, int]],
+    a: list[_Section],
+    b: list[_Section],
+    off_a: list[int],
+    off_b: list[int],
+    labels: tuple[str, str],
+) -> Iterator[str]:
+    def line_at(secs: list[_Section], offs: list[int], i: int) -> str:
+        k = bisect_right(offs, i) - 1
+        return secs[k].line(i - offs[k])
+
+    grouped = _grouped(codes, CONTEXT)
+    started = False
+    for group in grouped:
+        if not started:
+            started = True
+            yield f"--- {labels[0]}"
+            yield f"+++ {labels[1]}"
+        first, last = group[0], group[-1]
+        r1 = _format_range(first[1], last[2])
+        r2 = _format_range(first[3], last[4])
+        yield f"@@ -{r1} +{r2} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for i in range(i1, i2):
+                    yield " " + line_at(a, off_a, i)
+                continue
+            if tag in ("replace", "delete"):
+                for i in range(i1, i2):
+                    yield "-" + line_at(a, off_a, i)
+            if tag in ("replace", "insert"):
+                for j in range(j1, j2):
+                    yield "+" + line_at(b, off_b, j)
+
+
+def _grouped(
+    codes: list[tuple[str, int, int, int, int]], n: int
+) -> Iterator[list[tuple[str, int, int, int, int]]]:
+    # Hunks of opcodes with up to n lines of context, as difflib's
+    # SequenceMatcher.get_grouped_opcodes makes them
+    if not codes:
+        return
+    codes = list(codes)
+    tag, i1, i2, j1, j2 = codes[0]
+    if tag == "equal":
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    tag, i1, i2, j1, j2 = codes[-1]
+    if tag == "equal":
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group: list[tuple[str, int, int, int, int]] = []
+    for tag, i1, i2, j1, j2 in codes:
+        # An equal run longer than both contexts ends one hunk, starts another
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
@@ -1,29 +1,35 @@
 from __future__ import annotations
 from pathlib import Path
-from ..core.config import Config
-from ..io.file_read import read_text_safe
+from typing import Iterable, Iterator
 
 SEPARATOR = "-" * 40
+TREE_BATCH = 4096  # tree lines per header piece
 
 
-def render_transcript(
-    project_name: str, tree_text: str, files: list[Path], config: Config
-) -> str:
-    header = (
+def iter_header(project_name: str, tree_lines: Iterable[str]) -> Iterator[str]:
+    # The header in pieces that each end a line, the tree streamed
+    # TREE_BATCH lines at a time
+    yield (
         f"PROJECT TRANSCRIPT: {project_name}\n"
         f"Generated by ContextPacker\n"
         f"{'=' * 50}\n\n"
-        f"Directory Tree:\n{tree_text}\n\n"
-        f"{'=' * 50}\n\n"
+        f"Directory Tree:\n"
     )
+    batch: list[str] = []
+    for line in tree_lines:
+        if len(batch) == TREE_BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+        batch.append(line)
+    yield "\n".join(batch) + f"\n\n{'=' * 50}\n\n"
+
 
-    body_parts: list[str] = []
-    root = config.project_root
+def render_section(rel: Path, content: str) -> str:
+    # One file entry; its text depends only on rel and content
+    head, tail = section_parts(rel)
+    return head + content + tail
 
-    for p in files:
-        rel = p.relative_to(root)
-        content = read_text_safe(p)
-        entry = f"File: {rel}\n[\n{content}\n]\n{SEPARATOR}\n"
-        body_parts.append(entry)
 
-    return header + "".join(body_parts)
+def section_parts(rel: Path) -> tuple[str, str]:
+    # What goes before and after a file's content in its section
+    return f"File: {rel}\n[\n", f"\n]\n{SEPARATOR}\n"
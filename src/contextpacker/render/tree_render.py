@@ -1,46 +1,108 @@
 from __future__ import annotations
 from pathlib import Path
-from ..core.model import Snapshot, FilteredSnapshot
+from typing import Callable, Iterator, Mapping
+from ..core.cancel import CancelToken, check_cancel
+from ..core.model import FilteredSnapshot, Node
+from ..core.compact_model import AnySnapshot
 
+CANCEL_EVERY = 4096  # lines between cancel checks
 
-def render_tree(snapshot: Snapshot, filtered: FilteredSnapshot) -> str:
-    # Tree Under Project Root
-    root = snapshot.root
-    lines = [f"Project: {root.name}"]
 
-    def children_of(p: Path) -> list[Path]:
-        ch = snapshot.children.get(p, [])
-        return [c for c in ch if c in filtered.visible_nodes]
+def render_tree(
+    snapshot: AnySnapshot,
+    filtered: FilteredSnapshot,
+    max_depth: int | None = None,
+    max_entries: int | None = None,
+) -> str:
+    # Tree Under Project Root
+    return "\n".join(iter_tree(snapshot, filtered, max_depth, max_entries))
 
-    for i, r in enumerate(filtered.tree_roots):
-        last = i == len(filtered.tree_roots) - 1
-        connector = "└── " if last else "├── "
-        lines.append(f"{connector}{r.name}")
 
-        extension = "    " if last else "│   "
-        _recurse(snapshot, filtered, r, lines, prefix=extension)
+def iter_tree(
+    snapshot: AnySnapshot,
+    filtered: FilteredSnapshot,
+    max_depth: int | None = None,
+    max_entries: int | None = None,
+    cancel: CancelToken | None = None,
+) -> Iterator[str]:
+    # Lines of the tree, depth first over an explicit stack of open
+    # directories (no recursion limit; one prefix string per directory).
+    # Directories at max_depth and entries past max_entries per directory
+    # collapse into a "… N more files" line.
+    nodes = snapshot.nodes
+    children = _children(snapshot, filtered)
+    yield f"Project: {snapshot.root.name}"
 
-    return "\n".join(lines)
+    # (prefix, depth of the entries, entries, iterator over the shown ones)
+    stack = [_level("", 1, filtered.tree_roots, max_entries)]
+    n = 0
+    while stack:
+        prefix, depth, kids, entries = stack[-1]
+        end = len(kids) - 1
+        for i, k in entries:
+            n += 1
+            if n % CANCEL_EVERY == 0:
+                check_cancel(cancel)
+            last = i == end
+            yield f"{prefix}{'└── ' if last else '├── '}{k.name}"
+            node = nodes.get(k)
+            if not (node and node.is_dir):
+                continue
+            sub = children(k)
+            if not sub:
+                continue
+            inner = prefix + ("    " if last else "│   ")
+            if max_depth is not None and depth >= max_depth:
+                yield f"{inner}└── {_more(nodes, children, sub)}"
+                continue
+            stack.append(_level(inner, depth + 1, sub, max_entries))
+            break
+        else:
+            stack.pop()
+            if max_entries is not None and len(kids) > max_entries:
+                hidden = kids[max(max_entries, 0) :]
+                yield f"{prefix}└── {_more(nodes, children, hidden)}"
 
 
-def _recurse(
-    snapshot: Snapshot,
-    filtered: FilteredSnapshot,
-    current: Path,
-    lines: list[str],
-    prefix: str,
-) -> None:
-    kids = children_of(snapshot, filtered, current)
-    for i, k in enumerate(kids):
-        last = i == len(kids) - 1
-        connector = "└── " if last else "├── "
-        lines.append(f"{prefix}{connector}{k.name}")
-        node = snapshot.nodes.get(k)
-        if node and node.is_dir:
-            extension = "    " if last else "│   "
-            _recurse(snapshot, filtered, k, lines, prefix + extension)
+def _level(
+    prefix: str, depth: int, kids: list[Path], max_entries: int | None
+) -> tuple[str, int, list[Path], Iterator[tuple[int, Path]]]:
+    shown = kids if max_entries is None else kids[: max(max_entries, 0)]
+    return prefix, depth, kids, enumerate(shown)
 
 
-def children_of(snapshot: Snapshot, filtered: FilteredSnapshot, p: Path) -> list[Path]:
+def children_of(
+    snapshot: AnySnapshot, filtered: FilteredSnapshot, p: Path
+) -> list[Path]:
     ch = snapshot.children.get(p, [])
     return [c for c in ch if c in filtered.visible_nodes]
+
+
+def _children(
+    snapshot: AnySnapshot, filtered: FilteredSnapshot
+) -> Callable[[Path], list[Path]]:
+    # Lists precomputed by the filter stage; filtered here otherwise
+    if filtered.visible_children:
+        return lambda p: filtered.visible_children.get(p, [])
+    return lambda p: children_of(snapshot, filtered, p)
+
+
+def _more(
+    nodes: Mapping[Path, Node],
+    children: Callable[[Path], list[Path]],
+    hidden: list[Path],
+) -> str:
+    # Counts what a collapsed line stands for: files below, else folders
+    files = folders = 0
+    stack = list(hidden)
+    while stack:
+        p = stack.pop()
+        node = nodes.get(p)
+        if node and node.is_dir:
+            folders += 1
+            stack.extend(children(p))
+        else:
+            files += 1
+    if files:
+        return f"… {files:,} more file{'s' if files != 1 else ''}"
+    return f"… {folders:,} more folder{'s' if folders != 1 else ''}"
@@ -0,0 +1,27 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+
+import pytest
+
+from contextpacker.cli import main
+
+
+def test_json_errors_are_json(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    missing = tmp_path / "missing"
+    assert main(["run", "--input", str(missing), "--json"]) == 1
+    out = capsys.readouterr().out
+    stats = json.loads(out)
+    assert stats["root"] == str(missing)
+    assert stats["error"].startswith("ContextPackerError: Not a directory")
+
+
+def test_plain_errors_go_to_stderr(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    assert main(["run", "--input", str(tmp_path / "missing")]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err.startswith("contextpacker: error: Not a directory")
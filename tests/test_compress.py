@@ -0,0 +1,98 @@
+from __future__ import annotations
+from pathlib import Path
+
+import pytest
+
+from contextpacker.core.config import Config
+from contextpacker.render.compress import compress_text
+
+ELIDE = Config(project_root=Path("."), elide_bodies=True)
+
+
+def elide(name: str, text: str) -> str:
+    return compress_text(Path(name), text, ELIDE)
+
+
+# Type declarations keep their bodies (and the methods in them)
+@pytest.mark.parametrize(
+    "name, header",
+    [
+        ("UserController.java", '@RequestMapping("/api") public class UserController'),
+        ("P.java", "public record P(int x, int y)"),
+        ("P.java", "record P(int x) implements Comparable<P>"),
+        (
+            "UsersController.cs",
+            '[Route("api/[controller]")] public class UsersController : ControllerBase',
+        ),
+        ("P.cs", "public record Person(string Name) : Base(Name)"),
+        ("P.cs", "public readonly record struct P(int X)"),
+        ("P.cs", "public struct Point(int x, int y)"),
+        ("Foo.kt", "class Foo(val x: Int)"),
+        ("Foo.kt", "data class Foo<T>(val x: T) : Bar(x)"),
+        ("Foo.kt", "class Foo @Inject constructor(val x: Int)"),
+        ("Foo.kt", "enum class Color(val rgb: Int)"),
+        ("Foo.kt", "object Registry : Base(1)"),
+        ("Foo.scala", "case class Foo(x: Int) extends Bar"),
+        ("Foo.scala", "class Foo(x: Int)(implicit ec: Ctx)"),
+        ("Foo.scala", "object Main extends App(1)"),
+        ("lib.rs", "#[derive(Debug)] impl<T> Trait for Vec<T> where T: Fn(i32)"),
+        ("Foo.ts", "export class Foo extends mixin(A, B)"),
+    ],
+)
+def test_type_declarations_are_kept(name: str, header: str) -> None:
+    text = header + " {\n    void f(int a) {\n        run(a);\n    }\n}\n"
+    out = elide(name, text)
+    assert "void f(int a) { ... }" in out
+    assert out.startswith(header + " {\n")
+
+
+# Functions and methods lose their bodies, signature kept
+@pytest.mark.parametrize(
+    "name, header",
+    [
+        ("A.java", '@GetMapping("/{id}") public User get(@PathVariable Long id)'),
+        ("A.java", "@Override\npublic void run() throws IOException, Ex"),
+        ("A.java", "void record(Event e)"),
+        ("A.cs", '[HttpGet("{id}")] public async Task<User> Get(int id)'),
+        ("A.cs", "public object Get(int id)"),
+        ("A.cs", "public Foo(int x) : base(x)"),
+        ("A.cs", "void F<T>(T x) where T : class, new()"),
+        ("a.kt", "fun <T> f(x: T): List<T> where T : Any"),
+        ("a.kt", "override suspend fun load(id: Int): User?"),
+        ("a.scala", "def f[A](x: A)(implicit ord: Ordering[A])"),
+        ("a.go", "func (r *Repo) Find(id int) (*User, error)"),
+        ("a.go", "func Read(p []byte) error"),
+        ("a.rs", "#[test]\nfn new<'a>(x: &'a str) -> Result<(), Box<dyn Error>>"),
+        ("a.rs", "pub fn f<T>(x: T) -> T where T: Clone"),
+        ("a.swift", "func load(_ id: Int) throws -> [User]"),
+        ("a.c", "#include <stdio.h>\n\nstatic struct node *new_node(int v)"),
+        ("a.c", "enum color parse_color(const char *s)"),
+        ("a.cpp", "template <class T> T max(T a, T b)"),
+        ("a.cpp", "int Foo::size() const noexcept override"),
+        ("a.cpp", "Foo::Foo(int x) : a(x), b(2)"),
+        ("a.ts", "async load(id: number): Promise<Map<string, User>>"),
+        ("a.js", "const load = (id) =>"),
+        ("a.m", "- (void)viewDidLoad"),
+    ],
+)
+def test_function_bodies_are_elided(name: str, header: str) -> None:
+    out = elide(name, header + " {\n    return run(1);\n}\n")
+    assert out == header + " { ... }\n"
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "if (a && b)",
+        "} else if (x)",
+        "for (int i = 0; i < n; i++)",
+        "switch (x)",
+        "when (x)",
+        "catch (Exception e)",
+        "int[] xs = new int[] ",
+        "x = f(a) +",
+    ],
+)
+def test_control_blocks_are_kept(header: str) -> None:
+    text = header + " {\n    h();\n}\n"
+    assert elide("a.java", text) == text
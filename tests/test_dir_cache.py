@@ -0,0 +1,23 @@
+from __future__ import annotations
+from pathlib import Path
+
+from contextpacker.io.dir_cache import load_dir_cache, save_dir_cache
+
+
+def test_only_listings_of_this_walk_are_saved(tmp_path: Path) -> None:
+    path = tmp_path / "cache.json"
+    cache = load_dir_cache(path)
+    cache.put("", 1, [("kept", True, False), ("gone", True, False)])
+    cache.put("kept/", 2, [("a.py", False, False)])
+    cache.put("gone/", 3, [("b.py", False, False)])
+    save_dir_cache(path, cache)
+
+    # "gone/" was deleted: the next walk does not look it up
+    cache = load_dir_cache(path)
+    assert cache.get("", 1) is not None
+    assert cache.get("kept/", 2) == [("a.py", False, False)]
+    save_dir_cache(path, cache)
+
+    cache = load_dir_cache(path)
+    assert cache.get("gone/", 3) is None
+    assert cache.get("kept/", 2) is not None
@@ -0,0 +1,47 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+
+import pytest
+
+from contextpacker.core.errors import ReadError
+from contextpacker.io.file_read import READ_BLOCK, stream_text
+
+BIG = ("x" * 99 + "\n").encode("ascii") * (4 * READ_BLOCK // 100)
+
+
+def test_streamed_text_round_trips(tmp_path: Path) -> None:
+    p = tmp_path / "big.txt"
+    p.write_bytes(BIG)
+    streamed = stream_text(p)
+    assert streamed is not None
+    assert (streamed.size, streamed.breaks) == (len(BIG), BIG.count(b"\n"))
+    assert b"".join(streamed.chunks()) == BIG
+
+
+def test_file_truncated_while_streamed_raises(tmp_path: Path) -> None:
+    p = tmp_path / "big.txt"
+    p.write_bytes(BIG)
+    streamed = stream_text(p)
+    assert streamed is not None
+    os.truncate(p, READ_BLOCK // 2)
+    with pytest.raises(ReadError):
+        b"".join(streamed.chunks())
+
+
+def test_file_replaced_while_streamed_keeps_content(tmp_path: Path) -> None:
+    p = tmp_path / "big.txt"
+    p.write_bytes(BIG)
+    streamed = stream_text(p)
+    assert streamed is not None
+    new = tmp_path / "new.txt"
+    new.write_bytes(b"short\n")
+    os.replace(new, p)
+    assert b"".join(streamed.chunks()) == BIG
+
+
+@pytest.mark.parametrize("data", [b"a\r\nb\n" * 1000, b"\xff\xfe" + BIG, b"\0" + BIG])
+def test_text_needing_a_decode_is_not_streamed(tmp_path: Path, data: bytes) -> None:
+    p = tmp_path / "f.txt"
+    p.write_bytes(data)
+    assert stream_text(p) is None
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from contextpacker.core.model import Node
+from contextpacker.io.file_read import STREAM_THRESHOLD
+from contextpacker.io.file_store import FileStore
+from contextpacker.policy.generated import detect_generated
+
+SOURCE = "def f(x):\n    return x + 1\n\n"
+SIZE = 4 * STREAM_THRESHOLD
+
+
+def scan(tmp_path: Path, name: str, text: str) -> tuple[str, int]:
+    # Reason and peak allocation of scanning a file that is not kept in memory
+    p = tmp_path / name
+    p.write_text(text, encoding="utf-8")
+    st = p.stat()
+    node = Node(p, Path(name), False, st.st_size, st.st_mtime_ns)
+    files = FileStore(SIZE * 2, 0)
+    files.entry(node)
+    tracemalloc.start()
+    try:
+        reason = files.generated(node)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return reason, peak
+
+
+@pytest.mark.parametrize(
+    "name, text, reason",
+    [
+        ("app.py", SOURCE * (SIZE // len(SOURCE)), ""),
+        ("api.py", "# Code generated by x. DO NOT EDIT.\n" + SOURCE * 40000, "marker"),
+        ("bundle.js", "var a=1;" * (SIZE // 8), "minified"),
+        ("app.js", SOURCE * 20000 + "var a=1;" * (SIZE // 8), "minified"),
+    ],
+    ids=["source", "marker", "minified", "minified-tail"],
+)
+def test_big_files_are_scanned_from_a_sample(
+    tmp_path: Path, name: str, text: str, reason: str
+) -> None:
+    found, peak = scan(tmp_path, name, text)
+    assert found == reason
+    assert peak < SIZE // 2  # decoding it whole takes SIZE or more
+
+
+PARAGRAPH = "This tool packs a project into one transcript for review. " * 8
+
+
+@pytest.mark.parametrize("name", ["README.md", "index.rst", "NOTES.txt", "LICENSE"])
+def test_prose_with_long_paragraphs_is_not_minified(name: str) -> None:
+    text = "# Title\n\n" + (PARAGRAPH + "\n\n") * 20 + PARAGRAPH * 120 + "\n"
+    assert detect_generated(Path(name), text) == ""
+    assert detect_generated(Path("bundle.js"), text) == "minified"
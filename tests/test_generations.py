@@ -0,0 +1,92 @@
+from __future__ import annotations
+from pathlib import Path
+
+import pytest
+
+from contextpacker.core.config import Config
+from contextpacker.core.runner import run
+from contextpacker.io import generations
+from contextpacker.io.generations import (
+    KEEP_GENERATIONS,
+    new_generation,
+    publish_generation,
+)
+from contextpacker.io.manifest import load_generation
+
+
+def project(tmp_path: Path) -> Config:
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.py").write_text("a = 1\n", encoding="utf-8")
+    return Config(project_root=tmp_path, selected_top_level=("src",))
+
+
+def test_each_run_publishes_a_new_generation(tmp_path: Path) -> None:
+    cfg = project(tmp_path)
+    first = run(cfg)
+    (tmp_path / "src" / "a.py").write_text("a = 2\n", encoding="utf-8")
+    second = run(cfg)
+
+    assert (first.generation, second.generation) == (1, 2)
+    assert "a = 1" in first.transcript_path.read_text(encoding="utf-8")
+    gen = load_generation(cfg.project_root, cfg.outputs)
+    assert gen is not None and gen.id == 2
+    assert gen.paths.transcript_path == second.transcript_path
+    assert "+a = 2" in gen.paths.changes_path.read_text(encoding="utf-8")
+
+
+def test_unpublished_generation_is_not_current(tmp_path: Path) -> None:
+    cfg = project(tmp_path).normalized()
+    run(cfg)
+    # A run that stopped after writing part of its directory
+    half = new_generation(cfg.project_root, cfg.outputs)
+    half.transcript_path.write_text("partial", encoding="utf-8")
+
+    gen = load_generation(cfg.project_root, cfg.outputs)
+    assert gen is not None and gen.id == 1
+    assert run(cfg).generation == 3
+
+
+def test_old_generations_are_pruned(tmp_path: Path) -> None:
+    cfg = project(tmp_path).normalized()
+    for _ in range(KEEP_GENERATIONS + 2):
+        last = run(cfg)
+    gens = last.transcript_path.parents[1]
+    kept = sorted(int(p.name) for p in gens.iterdir())
+    newest = last.generation
+    assert kept == list(range(newest - KEEP_GENERATIONS + 1, newest + 1))
+
+
+def test_damaged_generation_is_refused(tmp_path: Path) -> None:
+    cfg = project(tmp_path).normalized()
+    a = run(cfg)
+    data = a.transcript_path.read_bytes()
+    a.transcript_path.write_bytes(data.replace(b"a = 1", b"a = 9"))
+
+    assert load_generation(cfg.project_root, cfg.outputs, verify=False) is not None
+    assert load_generation(cfg.project_root, cfg.outputs) is None
+
+
+def test_racing_run_takes_the_next_id(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cfg = project(tmp_path).normalized()
+    first = new_generation(cfg.project_root, cfg.outputs)
+    # Another run made its directory after this one looked
+    monkeypatch.setattr(generations, "_existing", lambda gens: [])
+    second = new_generation(cfg.project_root, cfg.outputs)
+    assert (first.generation, second.generation) == (1, 2)
+
+
+def test_full_durability_syncs_the_entries_the_pointer_names(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cfg = project(tmp_path).normalized()
+    synced: list[Path] = []
+    monkeypatch.setattr(generations, "sync_dir", synced.append)
+    paths = new_generation(cfg.project_root, cfg.outputs)
+    publish_generation(paths, "full")
+
+    gen_dir = paths.transcript_path.parent
+    assert synced == [gen_dir, gen_dir.parent, paths.out_dir]
+    assert paths.pointer_path.read_text(encoding="utf-8") == "1\n"
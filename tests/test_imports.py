@@ -0,0 +1,53 @@
+from __future__ import annotations
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+HEADLESS = ("core", "render", "policy", "io")
+GUI_ONLY = ("tkinter", "multiprocessing")
+IMPORT_BUDGET = 0.25  # seconds for every headless module plus the CLI
+
+# Runs in a fresh interpreter: imports every headless module, then reports
+# how long that took and which GUI-only modules came along
+_PROBE = """
+import json, pkgutil, sys, time
+t = time.perf_counter()
+import contextpacker
+names = ["contextpacker.cli"]
+for pkg in {headless!r}:
+    path = [contextpacker.__path__[0] + "/" + pkg]
+    names += [f"contextpacker.{{pkg}}.{{m.name}}" for m in pkgutil.iter_modules(path)]
+for name in names:
+    __import__(name)
+print(json.dumps({{
+    "seconds": time.perf_counter() - t,
+    "modules": len(names),
+    "loaded": [m for m in {gui!r} if m in sys.modules],
+}}))
+"""
+
+
+def _probe() -> dict:
+    code = _PROBE.format(headless=HEADLESS, gui=GUI_ONLY)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        env={"PYTHONPATH": str(SRC)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout)
+
+
+def test_headless_imports_leave_out_gui_modules() -> None:
+    probe = _probe()
+    assert probe["modules"] > len(HEADLESS)
+    assert probe["loaded"] == []
+
+
+def test_headless_import_budget() -> None:
+    # Best of three, so a busy machine does not fail the run
+    seconds = min(_probe()["seconds"] for _ in range(3))
+    assert seconds < IMPORT_BUDGET, f"{seconds * 1000:.0f} ms"
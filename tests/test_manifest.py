@@ -0,0 +1,61 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any
+
+from contextpacker.core.model import Node
+from contextpacker.io.classify import CLASSIFIER_VERSION
+from contextpacker.io.file_store import FileStore
+from contextpacker.io.manifest import load_manifest_entries
+from contextpacker.policy.generated import DETECTOR_VERSION
+
+
+def write_manifest(path: Path, classifiers: dict[str, int] | None) -> Path:
+    data: dict[str, Any] = {
+        "run_utc": "2030-01-01T00:00:00+00:00",
+        "files": [
+            {
+                "path": "a.txt",
+                "size": 3,
+                "mtime_ns": 1,
+                "blake2b": "00",
+                "encoding": "utf-16",
+                "generated": "marker",
+            }
+        ],
+    }
+    if classifiers is not None:
+        data["classifiers"] = classifiers
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def test_entries_of_the_current_classifiers_are_loaded(tmp_path: Path) -> None:
+    versions = {"text": CLASSIFIER_VERSION, "generated": DETECTOR_VERSION}
+    entries = load_manifest_entries(write_manifest(tmp_path / "m.json", versions))
+    assert entries["a.txt"].encoding == "utf-16"
+    assert entries["a.txt"].generated == "marker"
+
+
+def test_entries_of_an_older_classifier_are_not_loaded(tmp_path: Path) -> None:
+    assert load_manifest_entries(write_manifest(tmp_path / "m.json", None)) == {}
+    versions = {"text": CLASSIFIER_VERSION - 1, "generated": DETECTOR_VERSION}
+    assert load_manifest_entries(write_manifest(tmp_path / "m.json", versions)) == {}
+
+
+def test_reasons_of_an_older_detector_are_scanned_again(tmp_path: Path) -> None:
+    versions = {"text": CLASSIFIER_VERSION, "generated": DETECTOR_VERSION - 1}
+    entries = load_manifest_entries(write_manifest(tmp_path / "m.json", versions))
+    assert entries["a.txt"].encoding == "utf-16"
+    assert entries["a.txt"].generated is None
+
+
+def test_binary_names_are_never_seeded_as_text(tmp_path: Path) -> None:
+    files = FileStore(1 << 20, 1 << 20)
+    for name in ("logo.png", "notes.txt"):
+        p = tmp_path / name
+        p.write_bytes(b"abc")
+        st = p.stat()
+        node = Node(p, Path(name), False, st.st_size, st.st_mtime_ns)
+        files.seed(node, "00", generated="")
+        assert files.is_text(node) == (name == "notes.txt")